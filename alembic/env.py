@@ -3,8 +3,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Existing imports...
+import logging
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
+from sqlalchemy.engine import make_url
 from alembic import context
 
 
@@ -17,6 +19,7 @@ config = context.config
 # This line sets up loggers basically.
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
+logger = logging.getLogger("alembic.env")
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -30,7 +33,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import Base and models so Alembic sees them
 from app.db import Base
-from app.models import post, vote, comment, user  # 👈 make sure all models are imported
+from app.models import post, post_tombstone, vote, comment, user  # 👈 make sure all models are imported
 
 # Set metadata for Alembic to inspect
 target_metadata = Base.metadata
@@ -56,7 +59,7 @@ def run_migrations_offline() -> None:
     """
     url = os.getenv("DATABASE_URL")
 
-    print("🚀 Running migrations on:", url)
+    logger.info("Running migrations on: %s", make_url(url).render_as_string(hide_password=True))
 
 
     context.configure(
@@ -85,7 +88,7 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
 
-    print("🚀 Connecting to DB:", url)
+    logger.info("Connecting to DB: %s", make_url(url).render_as_string(hide_password=True))
 
     with connectable.connect() as connection:
         context.configure(
@@ -0,0 +1,55 @@
+"""post change versions and tombstones
+
+Revision ID: 4f1c9a2b7d3e
+Revises: ba0ad8774f98
+Create Date: 2026-10-19 10:12:41.508311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c9a2b7d3e'
+down_revision: Union[str, Sequence[str], None] = 'ba0ad8774f98'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('post_version_seq')))
+
+    # Step 1: Add as nullable, backfill existing rows from the sequence, then enforce
+    op.add_column('posts', sa.Column('version', sa.BigInteger(), nullable=True))
+    op.execute("UPDATE posts SET version = nextval('post_version_seq')")
+    op.alter_column('posts', 'version',
+               existing_type=sa.BigInteger(),
+               nullable=False,
+               server_default=sa.text("nextval('post_version_seq')"))
+    op.create_index(op.f('ix_posts_version'), 'posts', ['version'], unique=False)
+    op.create_index(op.f('ix_posts_timestamp'), 'posts', ['timestamp'], unique=False)
+
+    op.create_table('post_tombstones',
+    sa.Column('post_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index(op.f('ix_post_tombstones_version'), 'post_tombstones', ['version'], unique=False)
+    op.create_index(op.f('ix_post_tombstones_deleted_at'), 'post_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_post_tombstones_deleted_at'), table_name='post_tombstones')
+    op.drop_index(op.f('ix_post_tombstones_version'), table_name='post_tombstones')
+    op.drop_table('post_tombstones')
+    op.drop_index(op.f('ix_posts_timestamp'), table_name='posts')
+    op.drop_index(op.f('ix_posts_version'), table_name='posts')
+    op.drop_column('posts', 'version')
+    op.execute(sa.schema.DropSequence(sa.Sequence('post_version_seq')))
@@ -0,0 +1,36 @@
+"""index version_xid for delta sync
+
+Revision ID: a9d4c6e2f817
+Revises: e5f7a3c9b102
+Create Date: 2026-10-20 15:02:41.518337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4c6e2f817'
+down_revision: Union[str, Sequence[str], None] = 'e5f7a3c9b102'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Delta sync filters on "version > N OR version_xid >= xmin"; with both
+    # columns indexed Postgres can BitmapOr the two ranges instead of reading
+    # every live post (and every tombstone) in the area
+    with op.get_context().autocommit_block():
+        op.create_index('ix_posts_version_xid', 'posts', ['version_xid'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_post_tombstones_version_xid', 'post_tombstones', ['version_xid'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_tombstones_version_xid', table_name='post_tombstones')
+    op.drop_index('ix_posts_version_xid', table_name='posts')
@@ -0,0 +1,79 @@
+"""cascade votes and comments on post delete
+
+Revision ID: b7e2d5c8a91f
+Revises: 4f1c9a2b7d3e
+Create Date: 2026-10-19 11:40:07.113942
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d5c8a91f'
+down_revision: Union[str, Sequence[str], None] = '4f1c9a2b7d3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_constraint(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return bool(op.get_bind().scalar(sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}))
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Every step can be rerun: if this stops partway (e.g. on leftover orphan
+    votes), fix the cause and run the upgrade again.
+    """
+    # Step 1: Index the FK columns so cascades (and per-post lookups) don't scan.
+    # CONCURRENTLY can't run inside a transaction (Alembic wraps the whole upgrade in one).
+    # A failed CONCURRENTLY build leaves an INVALID index behind; drop it so
+    # if_not_exists doesn't keep it.
+    with op.get_context().autocommit_block():
+        for table, index in (('votes', 'ix_votes_post_id'), ('comments', 'ix_comments_post_id')):
+            if not context.is_offline_mode() and op.get_bind().scalar(sa.text("""
+                SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = :index
+            """), {"index": index}):
+                op.drop_index(index, table_name=table, postgresql_concurrently=True)
+            op.create_index(index, table, ['post_id'], unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+    # Step 2: Add the FK NOT VALID (brief lock, no scan) and commit it. From here
+    # on deletes cascade and no new orphan votes can appear (the expiry purge
+    # deletes posts every minute while the app runs).
+    if not _has_constraint('votes_post_id_fkey'):
+        op.create_foreign_key('votes_post_id_fkey', 'votes', 'posts', ['post_id'], ['id'],
+                              ondelete='CASCADE', postgresql_not_valid=True)
+
+    with op.get_context().autocommit_block():
+        # Step 3: Orphans from before step 2 would fail VALIDATE. Removing them
+        # here would be one unbatched DELETE holding locks on votes; that's
+        # `python -m app.maintenance.vote_gc`'s job.
+        if not context.is_offline_mode():
+            orphans = op.get_bind().scalar(sa.text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM votes v WHERE NOT EXISTS (SELECT 1 FROM posts p WHERE p.id = v.post_id)
+                )
+            """))
+            if orphans:
+                raise RuntimeError(
+                    "votes has rows for deleted posts; run `python -m app.maintenance.vote_gc`, "
+                    "then rerun this upgrade (the foreign key is in place, so no new ones appear)"
+                )
+
+        # Step 4: Validate in its own transaction: the scan runs under SHARE
+        # UPDATE EXCLUSIVE and doesn't block writes. A no-op if already valid.
+        op.execute("ALTER TABLE votes VALIDATE CONSTRAINT votes_post_id_fkey")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('votes_post_id_fkey', 'votes', type_='foreignkey')
+    op.drop_index('ix_comments_post_id', table_name='comments', if_exists=True)
+    op.drop_index('ix_votes_post_id', table_name='votes', if_exists=True)
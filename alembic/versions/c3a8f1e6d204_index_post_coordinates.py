@@ -0,0 +1,28 @@
+"""index post coordinates
+
+Revision ID: c3a8f1e6d204
+Revises: b7e2d5c8a91f
+Create Date: 2026-10-19 12:31:55.870219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8f1e6d204'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d5c8a91f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_latitude_longitude', 'posts', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_latitude_longitude', table_name='posts')
@@ -0,0 +1,35 @@
+"""record the writing transaction with post versions
+
+Revision ID: e5f7a3c9b102
+Revises: c3a8f1e6d204
+Create Date: 2026-10-20 09:14:22.630518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f7a3c9b102'
+down_revision: Union[str, Sequence[str], None] = 'c3a8f1e6d204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CURRENT_XID = sa.text("pg_current_xact_id()::text::bigint")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows were committed long ago: a constant 0 backfills them without
+    # a table rewrite, then new writes default to their own transaction id
+    for table in ('posts', 'post_tombstones'):
+        op.add_column(table, sa.Column('version_xid', sa.BigInteger(), nullable=False, server_default='0'))
+        op.alter_column(table, 'version_xid', existing_type=sa.BigInteger(), server_default=CURRENT_XID)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('post_tombstones', 'version_xid')
+    op.drop_column('posts', 'version_xid')
@@ -1,11 +1,18 @@
 # app/auth.py
-import os, time
-from typing import Optional, Dict, Any
+import asyncio, os, time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, Tuple
 
 import httpx
 from fastapi import Header, HTTPException, Request
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_503_SERVICE_UNAVAILABLE
-from jose import jwt
+from jose import jwt, jwk
+from jose.backends.base import Key
+
+from app.cache import near_cache
+from app.profiling import profiler
+from app.middleware.admission import throttle_user
 
 COGNITO_REGION = os.getenv("COGNITO_REGION", "us-east-1")
 COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID", "")
@@ -14,25 +21,47 @@ COGNITO_CLIENT_ID = os.getenv("COGNITO_CLIENT_ID", "")  # App Client ID
 ISSUER = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}"
 JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
 
-_jwks_cache: Optional[Dict[str, Any]] = None
-_jwks_cached_at: float = 0.0
 _JWKS_TTL_SECONDS = 3600
+_JWKS_CACHE_KEY = "auth:jwks"
+_JWKS_LAST_GOOD_KEY = "auth:jwks:last_good"  # no TTL: fallback while Cognito is unreachable
+
+# RSA signature checks are CPU-bound; run them off the event loop on a small
+# dedicated pool so auth bursts can't stall every other coroutine on the worker
+AUTH_VERIFY_THREADS = int(os.getenv("AUTH_VERIFY_THREADS", "4"))
+_verify_pool = ThreadPoolExecutor(max_workers=AUTH_VERIFY_THREADS, thread_name_prefix="jwt-verify")
+
+# kid -> (parsed public key, parsed at). Parsing the JWK per request is wasted
+# work; key objects can't go through the cache, so this is per process and
+# re-checked against the JWKS as often as the JWKS itself is refreshed.
+_parsed_keys: Dict[str, Tuple[Key, float]] = {}
+
+async def _cache_get(key: str) -> Optional[Any]:
+    # Local hit answers inline; only a miss pays the (remote) round trip, off the loop
+    value = near_cache.peek(key)
+    if value is None:
+        value = await asyncio.get_running_loop().run_in_executor(None, near_cache.get, key)
+    return value
 
-async def _get_jwks() -> Dict[str, Any]:
-    global _jwks_cache, _jwks_cached_at
-    now = time.time()
-    if _jwks_cache is None or (now - _jwks_cached_at) > _JWKS_TTL_SECONDS:
+async def _cache_set(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    await asyncio.get_running_loop().run_in_executor(None, partial(near_cache.set, key, value, ttl))
+
+async def _get_jwks(force_refresh: bool = False) -> Dict[str, Any]:
+    # Shared across workers via the cache subsystem, so one fetch warms them all
+    jwks = None if force_refresh else await _cache_get(_JWKS_CACHE_KEY)
+    if jwks is None:
         async with httpx.AsyncClient(timeout=10) as client:
             try:
                 resp = await client.get(JWKS_URL)
                 resp.raise_for_status()
             except httpx.HTTPError as e:
-                if _jwks_cache is None:
+                last_good = await _cache_get(_JWKS_LAST_GOOD_KEY)
+                if last_good is None:
                     raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, f"JWKS fetch failed: {e}")
-                return _jwks_cache
-            _jwks_cache = resp.json()
-            _jwks_cached_at = now
-    return _jwks_cache
+                return last_good
+            jwks = resp.json()
+            await _cache_set(_JWKS_CACHE_KEY, jwks, ttl=_JWKS_TTL_SECONDS)
+            await _cache_set(_JWKS_LAST_GOOD_KEY, jwks)
+    return jwks
 
 def _get_kid(token: str) -> str:
     try:
@@ -50,35 +79,45 @@ def _find_key_for_kid(kid: str, jwks: Dict[str, Any]) -> Optional[Dict[str, Any]
             return k
     return None
 
-# ---------------------------
-# NEW: decode & verify ACCESS token
-# ---------------------------
-async def _decode_access_token(token: str) -> Dict[str, Any]:
-    jwks = await _get_jwks()
+async def _resolve_key(token: str) -> Key:
     kid = _get_kid(token)
-    key = _find_key_for_kid(kid, jwks)
-    if not key:
+    cached = _parsed_keys.get(kid)
+    if cached is not None and time.monotonic() - cached[1] < _JWKS_TTL_SECONDS:
+        return cached[0]
+    jwks = await _get_jwks()
+    jwk_dict = _find_key_for_kid(kid, jwks)
+    if not jwk_dict:
         # refresh once (rotation)
-        global _jwks_cache, _jwks_cached_at
-        _jwks_cache, _jwks_cached_at = None, 0.0
-        jwks = await _get_jwks()
-        key = _find_key_for_kid(kid, jwks)
-        if not key:
+        jwks = await _get_jwks(force_refresh=True)
+        jwk_dict = _find_key_for_kid(kid, jwks)
+        if not jwk_dict:
             raise HTTPException(HTTP_401_UNAUTHORIZED, "Unknown signing key")
+    try:
+        key = jwk.construct(jwk_dict, algorithm="RS256")
+    except Exception as e:
+        raise HTTPException(HTTP_401_UNAUTHORIZED, f"Unusable signing key: {e}")
+    _parsed_keys[kid] = (key, time.monotonic())
+    return key
 
+async def _verify(token: str, key: Key, **kwargs) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
     try:
-        # Access tokens don't carry 'aud'; check issuer + signature,
-        # then validate token_use and client_id manually.
-        claims = jwt.decode(
-            token,
-            key,                      # jose accepts a JWK dict
-            algorithms=["RS256"],
-            issuer=ISSUER,
-            options={"verify_aud": False},
+        return await loop.run_in_executor(
+            _verify_pool,
+            profiler.wrap(partial(jwt.decode, token, key, algorithms=["RS256"], issuer=ISSUER, **kwargs)),
         )
     except Exception as e:
         raise HTTPException(HTTP_401_UNAUTHORIZED, f"Invalid token: {e}")
 
+# ---------------------------
+# NEW: decode & verify ACCESS token
+# ---------------------------
+async def _decode_access_token(token: str) -> Dict[str, Any]:
+    key = await _resolve_key(token)
+    # Access tokens don't carry 'aud'; check issuer + signature,
+    # then validate token_use and client_id manually.
+    claims = await _verify(token, key, options={"verify_aud": False})
+
     if claims.get("token_use") != "access":
         raise HTTPException(HTTP_401_UNAUTHORIZED, "Wrong token_use; expected 'access'")
     if claims.get("client_id") != COGNITO_CLIENT_ID:
@@ -88,26 +127,8 @@ async def _decode_access_token(token: str) -> Dict[str, Any]:
 
 # (Keep this around only if you still need to validate ID tokens elsewhere)
 async def _decode_id_token(token: str) -> Dict[str, Any]:
-    jwks = await _get_jwks()
-    kid = _get_kid(token)
-    key = _find_key_for_kid(kid, jwks)
-    if not key:
-        global _jwks_cache, _jwks_cached_at
-        _jwks_cache, _jwks_cached_at = None, 0.0
-        jwks = await _get_jwks()
-        key = _find_key_for_kid(kid, jwks)
-        if not key:
-            raise HTTPException(HTTP_401_UNAUTHORIZED, "Unknown signing key")
-    try:
-        claims = jwt.decode(
-            token,
-            key,
-            algorithms=["RS256"],
-            audience=COGNITO_CLIENT_ID,  # ID tokens have 'aud'
-            issuer=ISSUER,
-        )
-    except Exception as e:
-        raise HTTPException(HTTP_401_UNAUTHORIZED, f"Invalid token: {e}")
+    key = await _resolve_key(token)
+    claims = await _verify(token, key, audience=COGNITO_CLIENT_ID)  # ID tokens have 'aud'
     if claims.get("token_use") != "id":
         raise HTTPException(HTTP_401_UNAUTHORIZED, "Wrong token_use; expected 'id'")
     return claims
@@ -119,6 +140,7 @@ async def require_user(request: Request, authorization: Optional[str] = Header(N
     token = authorization.split(" ", 1)[1]
     claims = await _decode_access_token(token)   # ⬅️ access token now
     request.state.user = claims
+    throttle_user(request, claims)
     return claims
 
 async def optional_user(request: Request, authorization: Optional[str] = Header(None)) -> Optional[Dict[str, Any]]:
@@ -127,10 +149,11 @@ async def optional_user(request: Request, authorization: Optional[str] = Header(
     token = authorization.split(" ", 1)[1]
     try:
         claims = await _decode_access_token(token)  # ⬅️ access token now
-        request.state.user = claims
-        return claims
     except HTTPException:
         return None
+    request.state.user = claims
+    throttle_user(request, claims)
+    return claims
 
 def cognito_info() -> Dict[str, Any]:
     return {"issuer": ISSUER, "client_id_set": bool(COGNITO_CLIENT_ID)}
@@ -0,0 +1,32 @@
+# app/cache/__init__.py
+# One cache subsystem for the whole app. CACHE_URL picks the backend:
+#   unset / memory://   -> in-process LRU (single worker, local dev)
+#   redis://host:6379/0 -> shared across all uvicorn workers
+import os
+
+from .base import Cache
+from .memory import MemoryCache
+from .redis_backend import RedisCache
+from .tiered import TieredCache
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# How long a worker may serve a value from its near cache before re-reading Redis
+CACHE_LOCAL_TTL_SECONDS = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "5"))
+
+
+def build_cache(url: str = CACHE_URL) -> Cache:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    return MemoryCache(CACHE_MAX_ENTRIES)
+
+
+# `cache`: authoritative shared store (use from sync routes / threadpool).
+# `near_cache`: same data with a short in-process layer, for event-loop hot paths.
+cache = build_cache()
+near_cache = (
+    TieredCache(cache, CACHE_LOCAL_TTL_SECONDS, CACHE_MAX_ENTRIES)
+    if isinstance(cache, RedisCache) else cache
+)
+
+__all__ = ["Cache", "MemoryCache", "RedisCache", "TieredCache", "build_cache", "cache", "near_cache"]
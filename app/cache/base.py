@@ -0,0 +1,72 @@
+# app/cache/base.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+
+class Cache(ABC):
+    """Common interface for every cache backend.
+
+    Values must be JSON-compatible (dicts, lists, str, numbers, bools, None) so
+    the same code works against the in-process and the out-of-process backend.
+    TTLs are in seconds; None means "until evicted".
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def peek(self, key: str) -> Optional[Any]:
+        """`get` if it can be answered in-process (no network I/O), else None.
+        For the event loop, which must not block on a remote backend."""
+        return None
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if absent; True if this call stored it. Backends override atomically."""
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    @abstractmethod
+    def incr(self, key: str, delta: int = 1) -> int:
+        """Atomically add to an integer counter (created at 0) and return the new value."""
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Found keys only; misses are left out."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    # ---- Versioned invalidation ----
+    # Keys are built as "<namespace>:v<N>:<key>"; bumping N orphans the whole
+    # namespace at once and the old entries age out through TTL/LRU.
+    def namespace_version(self, namespace: str) -> int:
+        return int(self.get(f"ns:{namespace}") or 0)
+
+    def bump_namespace(self, namespace: str) -> int:
+        return self.incr(f"ns:{namespace}")
+
+    def versioned_key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:v{self.namespace_version(namespace)}:{key}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
@@ -0,0 +1,77 @@
+# app/cache/memory.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .base import Cache
+
+
+class MemoryCache(Cache):
+    """In-process LRU with per-entry TTL. Thread-safe; shared by nothing outside this process."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                return False
+            self._data[key] = (value, now + ttl if ttl is not None else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        with self._lock:
+            value, expires_at = self._data.get(key, (0, None))
+            if expires_at is not None and expires_at <= time.monotonic():
+                value, expires_at = 0, None  # expired counts as absent, like Redis
+            value = int(value) + delta
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "entries": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,112 @@
+# app/cache/redis_backend.py
+import json
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from app.logging_config import get_logger
+from .base import Cache
+
+logger = get_logger("cache")
+
+# After a failed call, skip Redis this long so requests don't each wait out a timeout
+_RETRY_SECONDS = 5.0
+
+
+class RedisCache(Cache):
+    """Out-of-process backend shared by all workers. Values are stored as JSON.
+
+    Redis is an optimization, not a dependency: when it is unreachable every
+    call degrades (reads miss, writes are dropped, `add` reports stored) with
+    a logged warning instead of raising into the request.
+    """
+
+    def __init__(self, url: str, prefix: str = "wya:", client=None):
+        try:
+            import redis
+            self._errors = (redis.RedisError, OSError)
+        except ImportError as e:  # only needed when CACHE_URL points at Redis
+            if client is None:
+                raise RuntimeError("CACHE_URL is a redis:// URL but the 'redis' package is not installed") from e
+            self._errors = (ConnectionError, TimeoutError, OSError)
+        if client is None:
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._down_until = 0.0
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def _load(self, raw) -> Optional[Any]:
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def _call(self, fallback, fn, *args, **kwargs):
+        now = time.monotonic()
+        if now < self._down_until:
+            return fallback
+        try:
+            return fn(*args, **kwargs)
+        except self._errors as e:
+            self.errors += 1
+            self._down_until = now + _RETRY_SECONDS
+            logger.warning("cache_unavailable", extra={"error": repr(e), "retry_seconds": _RETRY_SECONDS})
+            return fallback
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._load(self._call(None, self.client.get, self._k(key)))
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._call(None, self.client.set, self._k(key), json.dumps(value), px=self._px(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        # Unreachable: let the caller proceed (unguarded) rather than report a conflict
+        return bool(self._call(True, self.client.set, self._k(key), json.dumps(value), px=self._px(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self._call(None, self.client.delete, self._k(key))
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        return int(self._call(delta, self.client.incrby, self._k(key), delta))
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        found = {}
+        raws = self._call([None] * len(keys), self.client.mget, [self._k(k) for k in keys])
+        for key, raw in zip(keys, raws):
+            value = self._load(raw)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self._k(key), json.dumps(value), px=self._px(ttl))
+        self._call(None, pipe.execute)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        keys = [self._k(k) for k in keys]
+        if keys:
+            self._call(None, self.client.delete, *keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "available": time.monotonic() >= self._down_until,
+        }
@@ -0,0 +1,56 @@
+# app/cache/tiered.py
+from typing import Any, Dict, Optional
+
+from .base import Cache
+from .memory import MemoryCache
+
+
+class TieredCache(Cache):
+    """In-process LRU in front of a shared backend ("near cache").
+
+    Reads are served locally for at most `local_ttl` seconds, so hot paths
+    (e.g. auth on the event loop) rarely pay a network round trip, while writes
+    and invalidations from any worker are visible everywhere within that bound.
+    """
+
+    def __init__(self, remote: Cache, local_ttl: float = 5.0, max_entries: int = 10_000):
+        self.remote = remote
+        self.local = MemoryCache(max_entries)
+        self.local_ttl = local_ttl
+
+    def _local_ttl(self, ttl: Optional[float]) -> float:
+        return self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.remote.get(key)
+            if value is not None:
+                self.local.set(key, value, self.local_ttl)
+        return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.remote.set(key, value, ttl)
+        self.local.set(key, value, self._local_ttl(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        # Decided by the shared backend; a stale local copy must not say "present"
+        stored = self.remote.add(key, value, ttl)
+        if stored:
+            self.local.set(key, value, self._local_ttl(ttl))
+        return stored
+
+    def delete(self, key: str) -> None:
+        self.remote.delete(key)
+        self.local.delete(key)
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        value = self.remote.incr(key, delta)
+        self.local.delete(key)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "local": self.local.stats(), "remote": self.remote.stats()}
@@ -0,0 +1,133 @@
+# app/changes.py
+# Change-version bookkeeping for posts: every write bumps Post.version from a
+# single sequence, and deletions/expiries leave a tombstone carrying a version
+# too, so clients can ask for "everything since token N".
+#
+# Commit order: a version is drawn when the write runs, not when it commits,
+# so a slow transaction can commit version 100 after a reader has already seen
+# 101. Each write also stores its transaction id (version_xid). Any transaction
+# a reader's snapshot could not see has an xid >= that snapshot's xmin, so
+# "version > N OR version_xid >= xmin" also returns late commits below N.
+# Rows near the boundary can come back twice; clients dedupe by post id.
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import select, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal, set_statement_timeout
+from app.logging_config import get_logger
+from app.models.post import Post, POST_VERSION_SEQ
+from app.models.post_tombstone import PostTombstone
+
+logger = get_logger("changes")
+
+POST_TTL = timedelta(hours=24)
+# Tombstones outlive posts so a client that synced just before expiry still
+# learns about it; tokens older than this must do a full refresh.
+TOMBSTONE_TTL = timedelta(hours=48)
+
+_PURGE_INTERVAL_SECONDS = 60
+_last_purge_at: float = 0.0
+
+
+CURRENT_XID = literal_column("pg_current_xact_id()::text::bigint")
+SNAPSHOT_XMIN = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def next_post_version(db: Session) -> int:
+    return db.scalar(select(POST_VERSION_SEQ.next_value()))
+
+
+def snapshot_xmin(db: Session) -> int:
+    """Every transaction with an xid below this has finished (committed or rolled back).
+
+    Take it before the queries it guards: later statements get newer snapshots,
+    whose invisible writers all have xids >= this one.
+    """
+    return db.scalar(select(SNAPSHOT_XMIN))
+
+
+def touch_post(db: Session, post: Post) -> None:
+    """Mark a post as changed (edit, vote, comment count). Caller commits."""
+    post.version = next_post_version(db)
+    post.version_xid = CURRENT_XID
+
+
+def tombstone_post(db: Session, post: Post) -> None:
+    """Record a deletion for delta sync. Caller deletes the post and commits."""
+    stmt = pg_insert(PostTombstone).values(
+        post_id=post.id,
+        version=next_post_version(db),
+        latitude=post.latitude,
+        longitude=post.longitude,
+    ).on_conflict_do_nothing(index_elements=[PostTombstone.post_id])
+    db.execute(stmt)
+
+
+def live_threshold() -> datetime:
+    return datetime.utcnow() - POST_TTL
+
+
+def epoch_seconds(ts: Optional[datetime]) -> float:
+    # Timestamps are naive UTC (datetime.utcnow defaults)
+    return (ts - datetime(1970, 1, 1)).total_seconds() if ts else time.time()
+
+
+def purge_expired_posts(force: bool = False) -> None:
+    """Delete expired posts (leaving tombstones). Throttled per process.
+
+    Opens its own primary session so read routes can stay on a replica. Runs
+    inline on read requests, so it has its own statement timeout and a failure
+    is logged rather than failing (or tripping the breaker for) the read.
+    """
+    global _last_purge_at
+    now = time.monotonic()
+    if not force and now - _last_purge_at < _PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge_at = now
+
+    with SessionLocal() as db:
+        try:
+            set_statement_timeout(db, "purge_expired_posts")
+            _purge(db)
+        except SQLAlchemyError:
+            db.rollback()
+            logger.warning("purge_expired_posts_failed", exc_info=True)
+
+
+def _purge(db: Session) -> None:
+    threshold = live_threshold()
+    expired = select(
+        Post.id, POST_VERSION_SEQ.next_value(), Post.latitude, Post.longitude
+    ).where(Post.timestamp < threshold)
+    db.execute(
+        pg_insert(PostTombstone)
+        .from_select(["post_id", "version", "latitude", "longitude"], expired)
+        .on_conflict_do_nothing(index_elements=[PostTombstone.post_id])
+    )
+    db.execute(delete(Post).where(Post.timestamp < threshold))
+    db.execute(delete(PostTombstone).where(PostTombstone.deleted_at < datetime.utcnow() - TOMBSTONE_TTL))
+    db.commit()
+
+
+# ---- Sync tokens: "<version>.<snapshot xmin>.<issued epoch>" ----
+def make_sync_token(version: int, xmin: int) -> str:
+    return f"{version}.{xmin}.{int(time.time())}"
+
+
+def parse_sync_token(token: Optional[str]) -> Tuple[int, int, bool]:
+    """Returns (since_version, since_xmin, expired). Missing/garbled tokens
+    (and old two-part tokens, which can't be made commit-safe) mean a full sync."""
+    if not token:
+        return 0, 0, True
+    try:
+        version_s, xmin_s, issued_s = token.split(".")
+        version, xmin, issued = int(version_s), int(xmin_s), int(issued_s)
+    except ValueError:
+        return 0, 0, True
+    expired = time.time() - issued > TOMBSTONE_TTL.total_seconds()
+    return version, xmin, expired
@@ -0,0 +1,115 @@
+# app/circuit.py
+# Circuit breaker for database reads. When Postgres stalls, every request
+# would otherwise hold a thread and a connection until its timeout; after a
+# run of failures we stop trying for a while and let callers degrade instead.
+#
+# closed --(N consecutive failures)--> open --(reset timeout)--> half-open
+# half-open: a few probe requests go through; all succeed -> closed,
+# any fails -> open again.
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+DB_BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", "10"))
+DB_BREAKER_HALF_OPEN_PROBES = int(os.getenv("DB_BREAKER_HALF_OPEN_PROBES", "3"))
+
+# Connection loss, statement timeouts (QueryCanceled is an OperationalError)
+# and pool checkout timeouts. Anything else is a bug, not an outage.
+TRIP_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("circuit open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, half_open_probes: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def _retry_after(self, now: float) -> float:
+        return max(0.0, self._opened_at + self.reset_seconds - now)
+
+    def _acquire(self) -> bool:
+        """Returns whether this call is a half-open probe; raises CircuitOpen to reject."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if self._retry_after(now) > 0:
+                    self.rejected += 1
+                    raise CircuitOpen(self._retry_after(now))
+                self.state = HALF_OPEN
+                self._probes_in_flight = self._probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight + self._probe_successes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpen(self.reset_seconds)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _on_success(self, probe: bool) -> None:
+        with self._lock:
+            if probe and self.state == HALF_OPEN:
+                self._probes_in_flight -= 1
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = CLOSED
+            self._failures = 0
+
+    def _on_failure(self, probe: bool) -> None:
+        with self._lock:
+            self._failures += 1
+            if probe or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """Wrap a unit of DB work. Raises CircuitOpen without running it while open."""
+        probe = self._acquire()
+        try:
+            yield
+        except TRIP_ERRORS:
+            self._on_failure(probe)
+            raise
+        except BaseException:
+            # Not the database's fault (404, validation, ...); just free the probe slot
+            if probe:
+                with self._lock:
+                    self._probes_in_flight -= 1
+            raise
+        else:
+            self._on_success(probe)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+db_breaker = CircuitBreaker("db", DB_BREAKER_FAILURES, DB_BREAKER_RESET_SECONDS, DB_BREAKER_HALF_OPEN_PROBES)
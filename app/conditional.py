@@ -0,0 +1,32 @@
+# app/conditional.py
+# Cheap validators for conditional GET (ETag / If-None-Match -> 304).
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the given parts (versions, counts, query params, caller)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on either side
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
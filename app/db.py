@@ -1,20 +1,181 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from fastapi import Depends
 from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import functools
+import itertools
 import os
+import threading
+import time
+
+from app.cache import cache
+from app.dependencies import get_current_user
+from app.threadpool import mark_dispatched, record_thread_wait
+from app.logging_config import get_logger
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Comma-separated read-only replicas; empty = all traffic on the primary
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+# After a user writes, their reads stay on the primary this long (read-your-writes)
+STICKY_PRIMARY_SECONDS = float(os.getenv("STICKY_PRIMARY_SECONDS", "5"))
+_REPLICA_RETRY_SECONDS = 30
+# Per engine (primary and each replica); the threadpool is sized to match
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_CAPACITY = DB_POOL_SIZE + DB_MAX_OVERFLOW
+# Fail fast instead of holding a thread: waiting for a pooled connection, and
+# opening a new one to an unreachable host
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "3"))
+# Per-route statement timeouts in ms, e.g. "get_posts=2000,get_comments_for_post=1000",
+# merged over the defaults below; STATEMENT_TIMEOUT_MS applies to routes not
+# listed (0 = server default)
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "0"))
+STATEMENT_TIMEOUTS_MS: Dict[str, int] = {
+    "get_posts": 2000,
+    "get_comments_for_post": 1000,
+    "get_post_changes": 2000,
+    "purge_expired_posts": 5000,
+    "resync_indexes": 30000,
+}
+STATEMENT_TIMEOUTS_MS.update(
+    (name.strip(), int(ms))
+    for name, _, ms in (item.partition("=") for item in os.getenv("STATEMENT_TIMEOUTS_MS", "").split(","))
+    if name.strip() and ms
+)
+_ENGINE_ARGS: Dict[str, Any] = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    connect_args={"connect_timeout": DB_CONNECT_TIMEOUT_SECONDS},
+)
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **_ENGINE_ARGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+logger = get_logger("db")
+
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping ones that recently failed a checkout."""
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=create_engine(
+                url, pool_pre_ping=True, **_ENGINE_ARGS))
+            for url in urls
+        ]
+        self._down_until = [0.0] * len(urls)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        for idx, maker in enumerate(self.sessionmakers):
+            event.listen(maker.kw["bind"], "handle_error", functools.partial(self._on_error, idx))
+
+    def __bool__(self) -> bool:
+        return bool(self.sessionmakers)
+
+    def open_session(self) -> Optional[Session]:
+        """A session on a healthy replica, or None if all are down.
+
+        It connects on first use, in the route's thread. Checking out here, in
+        the dependency's thread, would hold a connection while the request
+        waits for a second thread; with the threadpool sized to the pool that
+        deadlocks until pool_timeout. A replica that fails to connect is
+        skipped by later requests (see `_on_error`).
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next)
+        for i in range(len(self.sessionmakers)):
+            idx = (start + i) % len(self.sessionmakers)
+            if self._down_until[idx] > now:
+                continue
+            db = self.sessionmakers[idx]()
+            db.info["replica"] = idx
+            return db
+        return None
+
+    def _on_error(self, idx: int, context) -> None:
+        # Lost or refused connections only; a statement timeout is not an outage
+        if context.is_disconnect or context.connection is None:
+            self._down_until[idx] = time.monotonic() + _REPLICA_RETRY_SECONDS
+
+    def health(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {"replica": i, "healthy": self._down_until[i] <= now}
+            for i in range(len(self.sessionmakers))
+        ]
+
+
+replicas = ReplicaSet(READ_REPLICA_URLS)
+
+
+def set_statement_timeout(db: Session, route: str) -> None:
+    """Cap every statement in the session's current transaction (SET LOCAL semantics)."""
+    ms = STATEMENT_TIMEOUTS_MS.get(route, STATEMENT_TIMEOUT_MS)
+    if ms > 0:
+        db.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": f"{ms}ms"})
+
 
-# Dependency to get DB session
-def get_db():
+def _user_key(user: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not user:
+        return None
+    return user.get("id") or user.get("sub")
+
+
+# Kept in the shared cache so the user's next read sticks to the primary
+# whichever worker serves it
+def _wrote_recently(user_key: Optional[str]) -> bool:
+    return bool(user_key) and cache.get(f"sticky_primary:{user_key}") is not None
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _note_commit(session):
+    wrote = session.info.pop("wrote", False)
+    user_key = session.info.get("user_key")
+    if user_key and wrote:
+        # The write is already committed: a cache failure here must not turn
+        # into a 500 the client retries (backends degrade, but be certain)
+        try:
+            cache.set(f"sticky_primary:{user_key}", 1, ttl=STICKY_PRIMARY_SECONDS)
+        except Exception:
+            logger.warning("sticky_primary_mark_failed", exc_info=True)
+
+
+# Dependency to get DB session (primary: writes and read-your-writes)
+def get_db(user: Optional[dict] = Depends(get_current_user),
+           dispatched_at: float = Depends(mark_dispatched)):
+    record_thread_wait(dispatched_at)
     db = SessionLocal()
+    db.info["user_key"] = _user_key(user)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency for read-only routes: a replica unless the caller just wrote
+def get_read_db(user: Optional[dict] = Depends(get_current_user),
+                dispatched_at: float = Depends(mark_dispatched)):
+    record_thread_wait(dispatched_at)
+    user_key = _user_key(user)
+    db = None
+    if replicas and not _wrote_recently(user_key):
+        db = replicas.open_session()
+    if db is None:
+        db = SessionLocal()
+        db.info["user_key"] = user_key
     try:
         yield db
     finally:
@@ -1,6 +1,7 @@
 # app/dependencies.py
 from typing import Optional, Dict, Any
-from fastapi import Header, Request
+from fastapi import Header, HTTPException, Request
+import hmac
 import os
 
 # --- ENV name compatibility (supports old and new names) ---
@@ -24,3 +25,11 @@ async def get_current_user(request: Request, authorization: Optional[str] = Head
 
 # If a route should be strictly authenticated, import this instead:
 get_required_user = require_user
+
+# --- Operator-only endpoints (metrics, diagnostics) ---
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Shared-secret check for /admin routes; disabled entirely when ADMIN_TOKEN is unset."""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,144 @@
+# app/establishments.py
+# In-memory prefix index over live posts' establishment names, for autocomplete.
+# Per geo cell we keep a sorted list of normalized names; a lookup bisects the
+# prefix range in the 3x3 cells around the user and ranks by live post count.
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.changes import POST_TTL, live_threshold, epoch_seconds
+from app.geo import grid_cell, neighbor_cells
+from app.models.post import Post
+
+RESYNC_SECONDS = float(os.getenv("ESTABLISHMENT_INDEX_RESYNC_SECONDS", "300"))
+
+Cell = Tuple[int, int]
+
+
+def normalize_establishment(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class _CellIndex:
+    __slots__ = ("keys", "counts")
+
+    def __init__(self):
+        self.keys: List[str] = []           # sorted, unique
+        self.counts: Dict[str, int] = {}    # key -> live posts in this cell
+
+    def add(self, key: str) -> None:
+        if key in self.counts:
+            self.counts[key] += 1
+        else:
+            self.counts[key] = 1
+            bisect.insort(self.keys, key)
+
+    def remove(self, key: str) -> None:
+        count = self.counts.get(key, 0)
+        if count > 1:
+            self.counts[key] = count - 1
+        elif count == 1:
+            del self.counts[key]
+            self.keys.pop(bisect.bisect_left(self.keys, key))
+
+    def with_prefix(self, prefix: str):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff")
+        for key in self.keys[lo:hi]:
+            yield key, self.counts[key]
+
+
+class EstablishmentIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells: Dict[Cell, _CellIndex] = defaultdict(_CellIndex)
+        self._names: Dict[str, str] = {}                  # key -> display name
+        self._posts: Dict[int, Tuple[str, Cell]] = {}     # post id -> (key, cell)
+        self._expiry: List[Tuple[float, int]] = []        # heap of (expires_at epoch, post id)
+        self.last_rebuild = 0.0
+
+    def _add(self, post_id: int, establishment: str, lat: float, lng: float, timestamp: datetime) -> None:
+        if not establishment or post_id in self._posts:
+            return
+        key = normalize_establishment(establishment)
+        cell = grid_cell(lat, lng)
+        self._cells[cell].add(key)
+        self._names.setdefault(key, " ".join(establishment.split()))
+        self._posts[post_id] = (key, cell)
+        heapq.heappush(self._expiry, (epoch_seconds(timestamp + POST_TTL), post_id))
+
+    def _remove(self, post_id: int) -> None:
+        found = self._posts.pop(post_id, None)
+        if found:
+            key, cell = found
+            self._cells[cell].remove(key)
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            _, post_id = heapq.heappop(self._expiry)
+            self._remove(post_id)
+
+    def add_post(self, post: Post) -> None:
+        with self._lock:
+            self._add(post.id, post.establishment, post.latitude, post.longitude, post.timestamp)
+
+    def remove_post(self, post_id: int) -> None:
+        with self._lock:
+            self._remove(post_id)
+
+    def suggest(self, prefix: str, lat: float, lng: float, limit: int = 8) -> List[Dict[str, Any]]:
+        prefix = normalize_establishment(prefix)
+        if not prefix:
+            return []
+        scores: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            self._expire(time.time())
+            for cell_id in neighbor_cells(lat, lng):
+                cell = self._cells.get(cell_id)
+                if cell is not None:
+                    for key, count in cell.with_prefix(prefix):
+                        scores[key] += count
+            best = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+            return [{"establishment": self._names[key], "live_posts": count} for key, count in best]
+
+    def rebuild(self, db: Session) -> None:
+        """Bulk load from live posts (startup and periodic resync across workers)."""
+        rows = (
+            db.query(Post.id, Post.establishment, Post.latitude, Post.longitude, Post.timestamp)
+            .filter(Post.timestamp >= live_threshold())
+            .all()
+        )
+        fresh = EstablishmentIndex()
+        buckets: Dict[Cell, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for post_id, establishment, lat, lng, ts in rows:
+            if not establishment:
+                continue
+            key = normalize_establishment(establishment)
+            cell = grid_cell(lat, lng)
+            buckets[cell][key] += 1
+            fresh._names.setdefault(key, " ".join(establishment.split()))
+            fresh._posts[post_id] = (key, cell)
+            fresh._expiry.append((epoch_seconds(ts + POST_TTL), post_id))
+        # Sort once per cell instead of insort per row
+        for cell, counts in buckets.items():
+            fresh._cells[cell].counts = dict(counts)
+            fresh._cells[cell].keys = sorted(counts)
+        heapq.heapify(fresh._expiry)
+
+        with self._lock:
+            self._cells, self._names = fresh._cells, fresh._names
+            self._posts, self._expiry = fresh._posts, fresh._expiry
+            self.last_rebuild = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cells": len(self._cells), "names": len(self._names), "live_posts": len(self._posts)}
+
+
+establishment_index = EstablishmentIndex()
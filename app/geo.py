@@ -0,0 +1,38 @@
+# app/geo.py
+from math import radians, cos, sin, acos, floor
+from typing import List, Tuple
+
+EARTH_RADIUS_MILES = 3958.8
+FEET_PER_MILE = 5280
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def distance_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points (spherical law of cosines)."""
+    phi1, lam1 = radians(lat1), radians(lng1)
+    phi2, lam2 = radians(lat2), radians(lng2)
+    # Clamp: rounding can push the cosine a hair past 1 for identical points
+    cos_angle = sin(phi1) * sin(phi2) + cos(phi1) * cos(phi2) * cos(lam2 - lam1)
+    return EARTH_RADIUS_MILES * acos(max(-1.0, min(1.0, cos_angle)))
+
+
+def bounding_box(lat: float, lng: float, radius_miles: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the circle; cheap SQL prefilter."""
+    d_lat = radius_miles / MILES_PER_DEGREE_LAT
+    # Longitude degrees shrink towards the poles; don't divide by ~0 near them
+    d_lng = radius_miles / (MILES_PER_DEGREE_LAT * max(cos(radians(lat)), 0.01))
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+# ~1.1 km of latitude per cell; a 3x3 block around the user is "near me"
+CELL_DEGREES = 0.01
+
+
+def grid_cell(lat: float, lng: float) -> Tuple[int, int]:
+    return floor(lat / CELL_DEGREES), floor(lng / CELL_DEGREES)
+
+
+def neighbor_cells(lat: float, lng: float) -> List[Tuple[int, int]]:
+    """The cell containing the point plus the 8 around it."""
+    row, col = grid_cell(lat, lng)
+    return [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
@@ -0,0 +1,85 @@
+# app/idempotency.py
+# Idempotency-Key support for retried writes (mobile clients on flaky networks).
+# The first response for (route, user, key) is stored and replayed for retries; concurrent duplicates on one worker share a single
+# execution, and a duplicate racing on another worker gets 409 + Retry-After.
+import hashlib
+import os
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.cache import MemoryCache, RedisCache, cache
+from app.singleflight import SingleFlight
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# A pending marker outlives any sane request; if the worker dies mid-write
+# the key unblocks after this long
+_PENDING_TTL_SECONDS = 60
+_MAX_KEY_LENGTH = 255
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+# Redis is shared by all workers and keys are namespaced. In-process, stored
+# responses get their own LRU: in the shared one a burst of writes would evict
+# JWKS and sticky-primary entries (and vice versa).
+idempotency_store = cache if isinstance(cache, RedisCache) else MemoryCache(IDEMPOTENCY_MAX_ENTRIES)
+
+idempotency_flight = SingleFlight("idempotency")
+
+
+def run_idempotent(
+    idempotency_key: Optional[str],
+    route: str,
+    user: Optional[dict],
+    response: Response,
+    fn: Callable[[], Any],
+    fingerprint: str = "",
+) -> Any:
+    """Run `fn` once per Idempotency-Key and replay its JSON result afterwards.
+
+    `fingerprint` identifies the request payload: reusing a key for a different
+    payload is a client bug and gets 422 rather than someone else's response.
+    Errors are not stored, so a failed attempt can be retried with the same key.
+    """
+    if not idempotency_key:
+        return fn()
+    if len(idempotency_key) > _MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+
+    caller = user["id"] if user else "anon"
+    cache_key = f"idem:{route}:{caller}:{hashlib.sha1(idempotency_key.encode()).hexdigest()}"
+    digest = hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    stored = idempotency_store.get(cache_key)
+    if stored is None or stored.get("pending"):
+        # Callers coalesced onto our execution get the same (marker, stored) pair,
+        # so only the one that actually ran `fn` skips the replay handling below
+        ran_here = object()
+        owner, stored = idempotency_flight.do(cache_key, lambda: _execute(ran_here, cache_key, digest, fn))
+        if owner is ran_here:
+            return stored["body"]
+
+    if stored.get("pending"):
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    if stored["fingerprint"] != digest:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    response.headers["Idempotent-Replayed"] = "true"
+    return stored["body"]
+
+
+def _execute(marker: object, cache_key: str, digest: str, fn: Callable[[], Any]) -> Tuple[Optional[object], dict]:
+    if not idempotency_store.add(cache_key, {"pending": True}, ttl=_PENDING_TTL_SECONDS):
+        # Another worker got there first (or finished between our get and add)
+        return None, idempotency_store.get(cache_key) or {"pending": True}
+    try:
+        body = jsonable_encoder(fn())
+    except BaseException:
+        idempotency_store.delete(cache_key)
+        raise
+    stored = {"fingerprint": digest, "body": body}
+    idempotency_store.set(cache_key, stored, ttl=IDEMPOTENCY_TTL_SECONDS)
+    return marker, stored
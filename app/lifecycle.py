@@ -0,0 +1,74 @@
+# app/lifecycle.py
+# Startup/shutdown work shared by both entrypoints (main.py and app/main.py).
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal, DB_POOL_CAPACITY, replicas, set_statement_timeout
+from app.trending import trending, RESYNC_SECONDS as TRENDING_RESYNC_SECONDS
+from app.establishments import establishment_index, RESYNC_SECONDS as ESTABLISHMENT_INDEX_RESYNC_SECONDS
+from app.logging_config import get_logger, setup_logging, shutdown_logging
+from app.threadpool import configure_threadpool
+
+logger = get_logger("lifecycle")
+
+# (name, index, seconds between rebuilds)
+_RESYNCED = [
+    ("trending", trending, TRENDING_RESYNC_SECONDS),
+    ("establishment_index", establishment_index, ESTABLISHMENT_INDEX_RESYNC_SECONDS),
+]
+# After a failed rebuild, try again sooner than the full interval
+_RESYNC_RETRY_SECONDS = 30.0
+
+
+def _warm_in_memory_indexes() -> None:
+    with SessionLocal() as db:
+        trending.rebuild(db)
+        establishment_index.rebuild(db)
+
+
+def _rebuild(name: str, index) -> bool:
+    # A replica if there is one: these are full scans of the last day's rows
+    with replicas.open_session() or SessionLocal() as db:
+        try:
+            set_statement_timeout(db, "resync_indexes")
+            index.rebuild(db)
+            return True
+        except Exception:
+            logger.warning("index_resync_failed", extra={"index": name}, exc_info=True)
+            return False
+
+
+def _resync_loop(stop: threading.Event) -> None:
+    """Each worker's in-memory indexes only see its own writes; fold in the
+    other workers' from the tables, off the request path."""
+    now = time.monotonic()
+    next_at = {name: now + interval for name, _, interval in _RESYNCED}
+    while True:
+        wait = min(next_at.values()) - time.monotonic()
+        if stop.wait(max(0.0, wait)):
+            return
+        for name, index, interval in _RESYNCED:
+            if time.monotonic() >= next_at[name]:
+                ok = _rebuild(name, index)
+                next_at[name] = time.monotonic() + (interval if ok else min(interval, _RESYNC_RETRY_SECONDS))
+
+
+_resync_stop: Optional[threading.Event] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _resync_stop
+    setup_logging()  # no-op unless a previous shutdown stopped the writer
+    configure_threadpool(DB_POOL_CAPACITY)
+    await run_in_threadpool(_warm_in_memory_indexes)
+    _resync_stop = threading.Event()
+    threading.Thread(target=_resync_loop, args=(_resync_stop,), name="index-resync", daemon=True).start()
+    yield
+    _resync_stop.set()  # daemon: a rebuild in progress doesn't hold up shutdown
+    shutdown_logging()
@@ -0,0 +1,148 @@
+# app/logging_config.py
+# Structured JSON logs that never block a request thread on stdout: handlers
+# only enqueue, a background QueueListener thread formats and writes.
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Per-event sampling for high-volume events, e.g. "post_created=0.1,feed_served=0.01"
+LOG_SAMPLE_RATES: Dict[str, float] = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition("=") for item in os.getenv("LOG_SAMPLE_RATES", "").split(","))
+    if name.strip() and rate
+}
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["_DroppingQueueHandler"] = None
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"wya.{name}")
+
+
+class _ContextFilter(logging.Filter):
+    """Stamps the request's correlation id and applies per-event sampling (producer side)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = LOG_SAMPLE_RATES.get(record.msg) if isinstance(record.msg, str) else None
+        if rate is not None and random.random() >= rate:
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Drops (and counts) records instead of blocking when the writer falls behind."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Skip QueueHandler's eager message formatting; the listener thread does it.
+        # Only resolve %-args now, while they still hold the caller's values.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            payload["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def setup_logging() -> None:
+    """Idempotent; call once per process before the app starts serving."""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+    _handler = _DroppingQueueHandler(log_queue)
+    _handler.addFilter(_ContextFilter())
+    app_logger = logging.getLogger("wya")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(_handler)
+    app_logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """Flush what's queued and stop the writer thread."""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger("wya").removeHandler(_handler)
+        _listener.stop()
+        _listener, _handler = None, None
+
+
+def logging_stats() -> Dict[str, int]:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
+
+
+class RequestIdMiddleware:
+    """Pure ASGI: sets the correlation id (X-Request-ID in, or a new one) for the request's context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
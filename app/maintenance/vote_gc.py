@@ -0,0 +1,65 @@
+# app/maintenance/vote_gc.py
+# Purge votes whose post no longer exists (left over from before votes.post_id
+# had a foreign key). Batched so no single transaction holds many row locks,
+# and resumable: each batch commits, and --start-after skips what's been scanned.
+#
+#   python -m app.maintenance.vote_gc --batch-size 5000
+#   python -m app.maintenance.vote_gc --start-after 1200000   # resume
+import argparse
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+
+_ORPHAN_BATCH_SQL = text("""
+    SELECT v.id
+    FROM votes v
+    LEFT JOIN posts p ON p.id = v.post_id
+    WHERE p.id IS NULL AND v.id > :cursor
+    ORDER BY v.id
+    LIMIT :batch_size
+""")
+
+
+def purge_orphan_votes(
+    db: Session,
+    batch_size: int = 5000,
+    start_after: int = 0,
+    max_batches: Optional[int] = None,
+    pause_seconds: float = 0.0,
+) -> int:
+    """Delete orphan votes in id order, one committed batch at a time. Returns rows deleted."""
+    cursor, total, batches = start_after, 0, 0
+    while max_batches is None or batches < max_batches:
+        ids = db.execute(_ORPHAN_BATCH_SQL, {"cursor": cursor, "batch_size": batch_size}).scalars().all()
+        if not ids:
+            break
+        db.execute(text("DELETE FROM votes WHERE id = ANY(:ids)"), {"ids": list(ids)})
+        db.commit()
+        cursor = ids[-1]
+        total += len(ids)
+        batches += 1
+        print(f"vote_gc: deleted {len(ids)} (total {total}), resume with --start-after {cursor}")
+        if pause_seconds:
+            time.sleep(pause_seconds)  # leave headroom for live traffic
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Purge votes that reference deleted posts")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--start-after", type=int, default=0, help="vote id to resume after")
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        total = purge_orphan_votes(db, args.batch_size, args.start_after, args.max_batches, args.pause)
+    print(f"vote_gc: done, {total} orphan votes deleted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+from .admission import AdmissionControlMiddleware, admission_stats, throttle_user
+from .profiling import ProfilingMiddleware
+
+__all__ = ["AdmissionControlMiddleware", "admission_stats", "throttle_user", "ProfilingMiddleware"]
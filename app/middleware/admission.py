@@ -0,0 +1,175 @@
+# app/middleware/admission.py
+# Admission control: shed load early instead of queueing it behind a saturated
+# threadpool / DB pool. Runs on the event loop before any route or dependency.
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import HTTPException
+
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "5"))     # tokens / second
+USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "20"))
+IP_RATE = float(os.getenv("ADMISSION_IP_RATE", "10"))
+IP_BURST = float(os.getenv("ADMISSION_IP_BURST", "40"))
+TRUST_FORWARDED_FOR = os.getenv("ADMISSION_TRUST_FORWARDED_FOR", "") == "1"
+_MAX_TRACKED_KEYS = 100_000
+
+# Never shed these: load balancer probes must keep answering during a spike
+EXEMPT_PATHS = {"/health", "/"}
+# Request state flag: this request should also spend from the caller's user bucket
+_RATE_LIMIT_USER = "admission_rate_limit_user"
+
+# (method, path) pairs that cost a DB round trip per call and get rate limited
+EXPENSIVE_ROUTES = [
+    ("GET", re.compile(r"^/posts(/changes)?$")),
+    ("POST", re.compile(r"^/posts$")),
+    ("POST", re.compile(r"^/posts/\d+/upvote$")),
+]
+
+
+class TokenBuckets:
+    """Per-key token buckets, LRU-bounded so spoofed keys can't grow memory forever."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = _MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, now: float) -> float:
+        """Consume one token. Returns 0 if admitted, else seconds until a token is available."""
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    # All state is touched only from the event loop, so no locking is needed.
+    def __init__(self):
+        self.max_concurrency = MAX_CONCURRENCY
+        self.user_buckets = TokenBuckets(USER_RATE, USER_BURST)
+        self.ip_buckets = TokenBuckets(IP_RATE, IP_BURST)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters: Dict[str, int] = {
+            "admitted": 0,
+            "shed_concurrency": 0,
+            "throttled_user": 0,
+            "throttled_ip": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_concurrency": self.max_concurrency,
+            "tracked_users": len(self.user_buckets),
+            "tracked_ips": len(self.ip_buckets),
+        }
+
+
+controller = AdmissionController()
+
+
+def admission_stats() -> Dict[str, Any]:
+    return controller.stats()
+
+
+def _is_expensive(method: str, path: str) -> bool:
+    return any(method == m and pattern.match(path) for m, pattern in EXPENSIVE_ROUTES)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _client_ip(scope) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def throttle_user(request, claims: Dict[str, Any]) -> None:
+    """Per-user bucket, applied by the auth dependencies once the token's
+    signature has checked out: keying on an unverified `sub` would let anyone
+    drain another user's bucket with forged tokens."""
+    sub = claims.get("sub")
+    if not sub or not request.scope.get("state", {}).get(_RATE_LIMIT_USER):
+        return
+    wait = controller.user_buckets.take(sub, time.monotonic())
+    if wait:
+        controller.counters["throttled_user"] += 1
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, admission: AdmissionController = controller):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        adm = self.admission
+        if adm.in_flight >= adm.max_concurrency:
+            adm.counters["shed_concurrency"] += 1
+            await _reject(send, 503, "Server busy, retry shortly", 1)
+            return
+
+        if _is_expensive(scope["method"], scope["path"]):
+            now = time.monotonic()
+            wait = adm.ip_buckets.take(_client_ip(scope), now)
+            if wait:
+                adm.counters["throttled_ip"] += 1
+                await _reject(send, 429, "Too many requests", wait)
+                return
+            # The per-user bucket needs a verified identity; auth applies it
+            scope.setdefault("state", {})[_RATE_LIMIT_USER] = True
+
+        adm.counters["admitted"] += 1
+        adm.in_flight += 1
+        adm.peak_in_flight = max(adm.peak_in_flight, adm.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            adm.in_flight -= 1
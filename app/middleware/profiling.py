@@ -0,0 +1,53 @@
+# app/middleware/profiling.py
+# Starts/stops a per-request profile when the admin toggle samples the request
+# or the caller asks with `X-Profile: 1` plus a valid X-Admin-Token. Otherwise
+# it passes straight through.
+import hmac
+
+# Module rather than name: app.auth imports this package while app.dependencies is still loading
+from app import dependencies
+from app.logging_config import request_id_var
+from app.profiling import profiler, current_profile
+
+
+def _wants_profile(headers) -> bool:
+    requested, token = False, None
+    for key, value in headers:
+        if key == b"x-profile":
+            requested = value == b"1"
+        elif key == b"x-admin-token":
+            token = value
+    admin_token = dependencies.ADMIN_TOKEN
+    return bool(requested and admin_token and token) and hmac.compare_digest(token, admin_token.encode())
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (profiler.sample_rate or dependencies.ADMIN_TOKEN):
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if not profiler.should_sample(path) and not _wants_profile(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.start(scope["method"], path, scope.get("query_string", b"").decode("latin-1"),
+                                 request_id_var.get())
+        token = current_profile.set(profile)
+        status = None
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            current_profile.reset(token)
+            profiler.stop(profile, status)
@@ -13,7 +13,7 @@ class Comment(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)  # ✅ now String
-    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
 
     establishment = Column(String, nullable=True)
     username = Column(String, nullable=True)
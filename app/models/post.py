@@ -1,21 +1,37 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Sequence, Index, text
 from datetime import datetime
 from app.db import Base
 from sqlalchemy.orm import relationship
 from sqlalchemy import ForeignKey
 
+# Monotonic change counter shared by every post write (create/edit/vote/comment)
+# and by tombstones, so "changed since N" is a single indexed range scan.
+POST_VERSION_SEQ = Sequence("post_version_seq")
+# Id of the transaction that drew a version; see "Commit order" in app/changes.py
+CURRENT_XID_DEFAULT = text("pg_current_xact_id()::text::bigint")
+
 class Post(Base):
     __tablename__ = "posts"
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String(280), nullable=False)
     establishment = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     upvotes = Column(Integer, default=0)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)  # 👈 Make sure ForeignKey is here
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     username = Column(String, nullable=False)
+    version = Column(BigInteger, POST_VERSION_SEQ, nullable=False, index=True)
+    version_xid = Column(BigInteger, nullable=False, server_default=CURRENT_XID_DEFAULT, index=True)
 
-    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
+    # passive_deletes: the DB's ON DELETE CASCADE removes children in the same
+    # statement instead of the ORM loading and deleting them row by row
+    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
+    votes = relationship("Vote", cascade="all, delete-orphan", passive_deletes=True)
     user = relationship("User", back_populates="posts")  # ✅ Add this line
+
+    __table_args__ = (
+        # Area queries are latitude/longitude range scans (feed, nearest-N ring walk)
+        Index("ix_posts_latitude_longitude", "latitude", "longitude"),
+    )
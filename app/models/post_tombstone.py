@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Float
+from datetime import datetime
+from app.db import Base
+from app.models.post import CURRENT_XID_DEFAULT
+
+class PostTombstone(Base):
+    """Marker left behind when a post is deleted or expires, for delta sync clients."""
+    __tablename__ = "post_tombstones"
+
+    post_id = Column(Integer, primary_key=True, autoincrement=False)  # the deleted post's id, never generated
+    version = Column(BigInteger, nullable=False, index=True)
+    version_xid = Column(BigInteger, nullable=False, server_default=CURRENT_XID_DEFAULT, index=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
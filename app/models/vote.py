@@ -7,7 +7,7 @@ class Vote(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, nullable=False)  # Removed ForeignKey
-    post_id = Column(Integer, nullable=False)  # Removed ForeignKey
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     __table_args__ = (
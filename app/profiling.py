@@ -0,0 +1,235 @@
+# app/profiling.py
+# On-demand wall-clock sampling profiler for individual requests.
+#
+# A profiled request gets a Profile in a contextvar. While any profile is
+# active, a sampler thread reads every thread's stack (sys._current_frames)
+# each PROFILE_INTERVAL_MS and credits the stacks doing that request's work:
+#   - the event loop thread, while the request's task is the one running
+#     (middleware, async auth);
+#   - AnyIO worker threads running under the request's copied context
+#     (get_db, the sync route body, response serialization);
+#   - threads explicitly attached with `profiler.wrap` (JWT verify pool).
+# Ticks where none of them is running are recorded as "(waiting)", i.e.
+# queued for a thread or blocked somewhere we don't sample.
+#
+# Output is collapsed stacks ("frame;frame;frame count"), ready for
+# flamegraph.pl / speedscope. Finished profiles go to a bounded ring buffer.
+# With no active profile there is no sampler thread and nothing is wrapped.
+import asyncio
+import contextvars
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Set
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# Frames to inspect from the bottom of a thread's stack when looking for the
+# context a worker is running under
+_ROOT_FRAMES = 8
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+current_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("current_profile", default=None)
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, query: str, request_id: Optional[str]):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.query = query
+        self.request_id = request_id
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.threads: Set[int] = set()   # explicitly attached thread ids
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+        self._started = time.perf_counter()
+
+    def finish(self, status: Optional[int]) -> None:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        self.status = status
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "samples": self.samples,
+        }
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float, buffer_size: int):
+        self.interval = interval_ms / 1000
+        self.sample_rate = 0.0
+        self.path_prefix: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active: List[Profile] = []
+        self._finished: "deque[Profile]" = deque(maxlen=buffer_size)
+        self._sampler: Optional[threading.Thread] = None
+        self._labels: Dict[Any, str] = {}
+        self.ticks = 0
+        self.tick_seconds_total = 0.0
+
+    def configure(self, sample_rate: float, path_prefix: Optional[str] = None) -> None:
+        self.sample_rate = sample_rate
+        self.path_prefix = path_prefix or None
+
+    def should_sample(self, path: str) -> bool:
+        """The admin toggle: profile this fraction of requests (optionally under a path)."""
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return False
+        return random.random() < self.sample_rate
+
+    # ---- request lifecycle (called on the event loop) ----
+
+    def start(self, method: str, path: str, query: str, request_id: Optional[str]) -> Profile:
+        profile = Profile(next(self._ids), method, path, query, request_id)
+        profile.task = asyncio.current_task()
+        profile.loop = asyncio.get_running_loop()
+        profile.loop_thread = threading.get_ident()
+        with self._lock:
+            self._active.append(profile)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._sampler.start()
+        return profile
+
+    def stop(self, profile: Profile, status: Optional[int]) -> None:
+        profile.finish(status)
+        with self._lock:
+            self._active.remove(profile)
+            self._finished.append(profile)
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Attach whichever thread runs `fn` to the current profile (for executors
+        that don't carry the request's context). Returns `fn` itself when not profiling."""
+        profile = current_profile.get()
+        if profile is None:
+            return fn
+
+        def attached(*args, **kwargs):
+            ident = threading.get_ident()
+            profile.threads.add(ident)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.threads.discard(ident)
+
+        return attached
+
+    # ---- sampler thread ----
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = list(self._active)
+            started = time.perf_counter()
+            self._sample(active, me)
+            elapsed = time.perf_counter() - started
+            self.ticks += 1
+            self.tick_seconds_total += elapsed
+            time.sleep(max(0.0, self.interval - elapsed))
+
+    def _sample(self, active: List[Profile], me: int) -> None:
+        names = {t.ident: t.name.rstrip("0123456789_") for t in threading.enumerate()}
+        hit: Set[int] = set()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame)
+                frame = frame.f_back
+            profile = self._owner(ident, stack, active)
+            if profile is None:
+                continue
+            labels = [names.get(ident, "thread")]
+            labels.extend(self._label(f.f_code) for f in reversed(stack))
+            profile.stacks[";".join(labels)] += 1
+            profile.samples += 1
+            hit.add(profile.id)
+        for profile in active:
+            if profile.id not in hit:
+                profile.stacks["(waiting)"] += 1
+                profile.samples += 1
+
+    @staticmethod
+    def _owner(ident: int, stack: List[Any], active: List[Profile]) -> Optional[Profile]:
+        loop_thread = False
+        for profile in active:
+            if ident in profile.threads:
+                return profile
+            if ident == profile.loop_thread:
+                loop_thread = True
+                if asyncio.tasks._current_tasks.get(profile.loop) is profile.task:
+                    return profile
+        if loop_thread:
+            return None  # busy with some other request's task
+        for frame in stack[-_ROOT_FRAMES:]:
+            for value in frame.f_locals.values():
+                if isinstance(value, contextvars.Context):
+                    profile = value.get(current_profile)
+                    if profile is not None and profile in active:
+                        return profile
+        return None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if "site-packages" + os.sep in path:
+                path = path.split("site-packages" + os.sep, 1)[1]
+            elif path.startswith(_REPO_ROOT):
+                path = os.path.relpath(path, _REPO_ROOT)
+            else:
+                path = os.path.basename(path)
+            label = self._labels[code] = f"{code.co_qualname} ({path})"
+        return label
+
+    # ---- admin ----
+
+    def profiles(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._finished)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._finished if p.id == profile_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "path_prefix": self.path_prefix,
+            "interval_ms": self.interval * 1000,
+            "active": len(self._active),
+            "buffered": len(self._finished),
+            "ticks": self.ticks,
+            "tick_ms_avg": round(self.tick_seconds_total / self.ticks * 1000, 3) if self.ticks else 0.0,
+        }
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS, PROFILE_BUFFER_SIZE)
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.dependencies import require_admin
+from app.middleware import admission_stats
+from app.db import replicas
+from app.cache import cache, near_cache
+from app.routes.post_routes import feed_flight, feed_validators, stale_feeds
+from app.trending import trending
+from app.establishments import establishment_index
+from app.idempotency import idempotency_flight, idempotency_store
+from app.logging_config import logging_stats
+from app.threadpool import threadpool_stats
+from app.circuit import db_breaker
+from app.profiling import profiler
+from app.schemas.admin_schema import ProfilingSettings
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+# Everything here is in-memory and async: the endpoints that report threadpool
+# saturation must not queue for a thread behind it
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "admission": admission_stats(),
+        "replicas": replicas.health(),
+        "feed_singleflight": feed_flight.stats(),
+        "feed_validator_singleflight": feed_validators.stats(),
+        "idempotency_singleflight": idempotency_flight.stats(),
+        "trending": trending.stats(),
+        "establishment_index": establishment_index.stats(),
+        "threadpool": threadpool_stats(),
+        "db_breaker": db_breaker.stats(),
+        "profiler": profiler.stats(),
+        "stale_feeds": stale_feeds.stats(),
+        "logging": logging_stats(),
+        "cache": cache.stats(),
+        "near_cache": near_cache.stats() if near_cache is not cache else None,
+        "idempotency_store": idempotency_store.stats() if idempotency_store is not cache else None,
+    }
+
+
+# Per-worker: with several workers, toggle each (or use X-Profile on a single request)
+@router.get("/profiling")
+async def get_profiling():
+    return profiler.stats()
+
+@router.put("/profiling")
+async def set_profiling(settings: ProfilingSettings):
+    profiler.configure(settings.sample_rate, settings.path_prefix)
+    return profiler.stats()
+
+@router.get("/profiles")
+async def list_profiles():
+    return profiler.profiles()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int):
+    """Collapsed stacks, one "frame;frame;... count" line each (flamegraph.pl, speedscope)."""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.collapsed()
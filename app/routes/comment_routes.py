@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlalchemy.orm import Session, joinedload
 from app.models.comment import Comment
 from app.models.post import Post
 from app.models.user import User
 from app.schemas.comment_schema import CommentCreate, CommentResponse
-from app.db import get_db
+from app.db import get_db, get_read_db, set_statement_timeout
+from app.circuit import db_breaker, CircuitOpen, TRIP_ERRORS
 from app.dependencies import get_current_user
-from typing import List
+from app.changes import touch_post
+from app.conditional import make_etag, etag_matches, not_modified
+from app.trending import trending
+from app.idempotency import run_idempotent
+from typing import List, Optional
 
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
@@ -14,12 +19,22 @@ router = APIRouter(prefix="/comments", tags=["Comments"])
 @router.post("/", response_model=CommentResponse)
 def create_comment(
     comment: CommentCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    user_info: dict = Depends(get_current_user)
+    user_info: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
     if user_info is None:
         raise HTTPException(status_code=401, detail="Authentication required")
 
+    return run_idempotent(
+        idempotency_key, "create_comment", user_info, response,
+        lambda: _create_comment(comment, db, user_info),
+        fingerprint=comment.model_dump_json(),
+    )
+
+
+def _create_comment(comment: CommentCreate, db: Session, user_info: dict) -> dict:
     user = db.query(User).filter_by(id=user_info["id"]).first()
     if not user:
         user = User(
@@ -41,6 +56,7 @@ def create_comment(
         establishment=post.establishment
     )
     db.add(new_comment)
+    touch_post(db, post)  # comment_count changed
     db.commit()
     db.refresh(new_comment)
 
@@ -51,6 +67,7 @@ def create_comment(
         .options(joinedload(Comment.user), joinedload(Comment.post))
         .first()
     )
+    trending.record("comments", post.establishment, post.latitude, post.longitude)
 
     return {
         "id": enriched_comment.id,
@@ -64,7 +81,33 @@ def create_comment(
 
 
 @router.get("/post/{post_id}", response_model=List[CommentResponse])
-def get_comments_for_post(post_id: int, db: Session = Depends(get_db)):
+def get_comments_for_post(
+    post_id: int,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None),
+):
+    try:
+        with db_breaker.guard():
+            return _list_comments(db, post_id, response, if_none_match)
+    except (CircuitOpen, *TRIP_ERRORS) as e:
+        retry_after = e.retry_after if isinstance(e, CircuitOpen) else db_breaker.reset_seconds
+        raise HTTPException(
+            status_code=503,
+            detail="Comments temporarily unavailable",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+def _list_comments(db: Session, post_id: int, response: Response, if_none_match: Optional[str]):
+    set_statement_timeout(db, "get_comments_for_post")
+    # Adding/removing a comment bumps the parent post's version, so it is the validator
+    version = db.query(Post.version).filter(Post.id == post_id).scalar()
+    etag = make_etag("comments", post_id, version or 0)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
     comments = (
         db.query(Comment)
         .filter(Comment.post_id == post_id)
@@ -109,6 +152,8 @@ def delete_comment(
     if comment.user_id != user_info["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
+    if comment.post:
+        touch_post(db, comment.post)
     db.delete(comment)
     db.commit()
     
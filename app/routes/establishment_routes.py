@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Query
+from app.trending import trending
+from app.establishments import establishment_index
+
+
+router = APIRouter(prefix="/establishments", tags=["Establishments"])
+
+# Both read per-worker in-memory indexes (rebuilt in the background by
+# app.lifecycle), so they run on the event loop and never touch the database
+
+@router.get("/trending")
+async def get_trending_establishments(
+    user_lat: float = Query(..., description="User latitude"),
+    user_lng: float = Query(..., description="User longitude"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    return trending.top(user_lat, user_lng, limit)
+
+
+@router.get("/suggest")
+async def suggest_establishments(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    user_lat: float = Query(..., description="User latitude"),
+    user_lng: float = Query(..., description="User longitude"),
+    limit: int = Query(8, ge=1, le=25),
+):
+    """Autocomplete for PostCreate.establishment: nearby names with live posts, most popular first."""
+    return establishment_index.suggest(prefix, user_lat, user_lng, limit)
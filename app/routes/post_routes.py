@@ -1,85 +1,331 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, or_, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session, joinedload
-from app.db import get_db
+from app.db import get_db, get_read_db, set_statement_timeout
 from app.models.post import Post
+from app.models.post_tombstone import PostTombstone
 from app.models.vote import Vote
 from app.schemas.post_schema import PostCreate, PostRead, UpvoteRequest
-from typing import List, Annotated, Optional
+from typing import List, Annotated, Optional, Iterable, Set, Tuple
 from datetime import datetime, timedelta
+import heapq
+import os
+import time
 from app.dependencies import get_current_user
-
-from math import radians, cos, sin, acos
+from app.changes import (
+    touch_post, tombstone_post, purge_expired_posts, live_threshold,
+    make_sync_token, parse_sync_token, snapshot_xmin, epoch_seconds,
+)
+from app.geo import distance_miles, bounding_box, FEET_PER_MILE
+from app.conditional import make_etag, etag_matches, not_modified
+from app.singleflight import SingleFlight
+from app.trending import trending
+from app.establishments import establishment_index
+from app.idempotency import run_idempotent
+from app.logging_config import get_logger
+from app.circuit import db_breaker, CircuitOpen, TRIP_ERRORS
+from app.cache.memory import MemoryCache
 
 router = APIRouter()
+logger = get_logger("posts")
+
+# Concurrent feed requests for the same spot share one validator query, and
+# those that then need a body share one load + serialization
+feed_validators = SingleFlight("feed_validator")
+feed_flight = SingleFlight("feed")
+# ~11 m; clients in the same venue collapse onto one key
+_FEED_KEY_DECIMALS = 4
+MIN_RADIUS_FEET = 1500
+MAX_RADIUS_FEET = 15840
+
+# Last good feed per area, served (marked stale) while the database is unavailable
+STALE_FEED_TTL_SECONDS = float(os.getenv("STALE_FEED_TTL_SECONDS", "900"))
+stale_feeds = MemoryCache(max_entries=int(os.getenv("STALE_FEED_MAX_ENTRIES", "1000")))
+
+
+def _in_area_query(db: Session, user_lat: float, user_lng: float, radius_miles: float):
+    """Live posts inside the bounding box of the search circle (exact check is done in Python)."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(user_lat, user_lng, radius_miles)
+    return (
+        db.query(Post)
+        .filter(Post.timestamp >= live_threshold())
+        .filter(Post.latitude.between(min_lat, max_lat))
+        .filter(Post.longitude.between(min_lng, max_lng))
+    )
+
+
+def _within_radius(posts: Iterable[Post], user_lat: float, user_lng: float, radius_miles: float) -> List[Post]:
+    return [
+        p for p in posts
+        if p.latitude is not None and p.longitude is not None
+        and distance_miles(user_lat, user_lng, p.latitude, p.longitude) <= radius_miles
+    ]
+
+
+def _upvoted_post_ids(db: Session, user: Optional[dict], post_ids: List[int]) -> Set[int]:
+    """One query for the caller's votes on a page of posts (instead of one per post)."""
+    if not user or not post_ids:
+        return set()
+    rows = (
+        db.query(Vote.post_id)
+        .filter(Vote.user_id == user["id"], Vote.post_id.in_(post_ids))
+        .all()
+    )
+    return {r.post_id for r in rows}
+
+
+def _area_digest(db: Session, user_lat: float, user_lng: float, radius_miles: float) -> str:
+    """Validator for an area's feed: one aggregate over the bounding box, no rows loaded.
+
+    Digests the (id, version) pair of every live post in the box, so creates,
+    edits, deletions/expiries and a late commit of a lower version (see
+    "Commit order" in app/changes.py) all change it. It depends only on the
+    snapshot, so concurrent callers can share it.
+    """
+    pair = func.concat(Post.id, ":", Post.version)
+    pairs = func.string_agg(pair, aggregate_order_by(literal_column("','"), Post.id))
+    digest = _in_area_query(db, user_lat, user_lng, radius_miles).with_entities(func.md5(pairs)).scalar()
+    return digest or ""
+
+
+def _serialize_post(post: Post, has_voted: bool) -> dict:
+    post_dict = post.__dict__.copy()
+    post_dict.pop("user", None)  # eager-loaded for username only; don't leak the User row
+    post_dict.pop("version_xid", None)
+    post_dict["user_has_upvoted"] = has_voted
+    post_dict["comment_count"] = len(post.comments)
+    post_dict["username"] = post.user.username if post.user else "Unknown"
+    return post_dict
+
 
 @router.get("/posts")
 def get_posts(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: Optional[dict] = Depends(get_current_user),
     user_lat: float = Query(..., description="User latitude"),
     user_lng: float = Query(..., description="User longitude"),
-    radius_feet: float = Query(1500, description="Search radius in feet (min 1500, max 15840)")
+    radius_feet: float = Query(1500, description="Search radius in feet (min 1500, max 15840)"),
+    nearest: Optional[int] = Query(None, ge=1, le=100, description="Return the N closest posts (ignores radius_feet)"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    # Step 1: Clean up old posts
-    threshold = datetime.utcnow() - timedelta(hours=24)
-    db.query(Post).filter(Post.timestamp < threshold).delete()
-    db.commit()
+    # Normalize the area so nearby callers share a key, convert feet to miles
+    user_lat = round(user_lat, _FEED_KEY_DECIMALS)
+    user_lng = round(user_lng, _FEED_KEY_DECIMALS)
+    radius_miles = radius_feet / FEET_PER_MILE
+    if nearest:
+        # Nearest mode looks as far out as the maximum radius
+        radius_feet, radius_miles = MAX_RADIUS_FEET, MAX_RADIUS_FEET / FEET_PER_MILE
+    area_key = f"feed:{user_lat}:{user_lng}:{radius_feet}:{nearest}"
+
+    try:
+        with db_breaker.guard():
+            return _serve_feed(db, user, user_lat, user_lng, radius_feet, radius_miles, nearest,
+                               area_key, if_none_match)
+    except (CircuitOpen, *TRIP_ERRORS) as e:
+        # Database unavailable: fall back to the last feed served for this area
+        stale = stale_feeds.get(area_key)
+        retry_after = e.retry_after if isinstance(e, CircuitOpen) else db_breaker.reset_seconds
+        if stale is None:
+            logger.warning("feed_unavailable", extra={"error": type(e).__name__})
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Feed temporarily unavailable",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+        payload, stored_at = stale
+        logger.warning("feed_served_stale", extra={"error": type(e).__name__})
+        return JSONResponse(payload, headers={
+            "Warning": '110 - "Response is Stale"',
+            "Age": str(int(time.time() - stored_at)),
+            "Cache-Control": "no-store",
+        })
 
-    # Step 2: Convert feet to miles
-    radius_miles = radius_feet / 5280
 
-    # Step 3: Manually filter by distance
-    all_posts = (
-    db.query(Post)
-    .options(joinedload(Post.comments))
-    .filter(Post.timestamp >= threshold)
-    .all()
-)
-    posts = []
-    for post in all_posts:
-        if post.latitude is None or post.longitude is None:
-            continue
-
-        # Haversine formula (simplified)
-        lat1, lon1 = radians(user_lat), radians(user_lng)
-        lat2, lon2 = radians(post.latitude), radians(post.longitude)
-        earth_radius = 3958.8  # miles
-
-        distance = earth_radius * acos(
-            sin(lat1) * sin(lat2) +
-            cos(lat1) * cos(lat2) * cos(lon2 - lon1)
+def _serve_feed(db: Session, user: Optional[dict], user_lat: float, user_lng: float,
+                radius_feet: float, radius_miles: float, nearest: Optional[int],
+                area_key: str, if_none_match: Optional[str]):
+    # Clean up old posts (throttled; expired rows are filtered below anyway)
+    purge_expired_posts()
+    set_statement_timeout(db, "get_posts")
+
+    # The database a session reads from (replica index, None = primary) is part
+    # of every key: a caller must never share a validator or payload with a
+    # lagging replica, and read-your-writes callers stay on the primary's.
+    area = (user_lat, user_lng, radius_feet, nearest, db.info.get("replica"))
+
+    # Concurrent callers share one validator query; unchanged since the
+    # client's copy -> 304 without loading full posts
+    if nearest:
+        hits = feed_validators.do(area, lambda: _nearest_hits(db, user_lat, user_lng, nearest))
+        validator = ",".join(f"{pid}:{version}" for _, pid, version in hits)
+        load = lambda: _load_nearest_payload(db, hits)
+    else:
+        validator = feed_validators.do(area, lambda: _area_digest(db, user_lat, user_lng, radius_miles))
+        load = lambda: _load_feed_payload(db, user_lat, user_lng, radius_miles)
+    # The caller is part of the tag because user_has_upvoted differs per user
+    caller = user["id"] if user else "anon"
+    etag = make_etag("feed", caller, *area[:4], validator)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    # One shared anonymous payload per validator, then this caller's vote flags.
+    # Every load starts after its validator was computed on the same database,
+    # so the body sent with a tag is never older than the tag.
+    shared = feed_flight.do((area, validator), load)
+    voted = _upvoted_post_ids(db, user, [p["id"] for p in shared])
+    # Anonymous copy: a stale response can't know the caller's votes
+    stale_feeds.set(area_key, (shared, time.time()), ttl=STALE_FEED_TTL_SECONDS)
+    if voted:
+        shared = [{**p, "user_has_upvoted": p["id"] in voted} for p in shared]
+    return JSONResponse(shared, headers={"ETag": etag})
+
+
+def _load_feed_payload(db: Session, user_lat: float, user_lng: float, radius_miles: float) -> List[dict]:
+    """Anonymous (caller-independent), JSON-ready feed for an area."""
+    # Bounding-box prefilter in SQL, exact distance in Python
+    candidates = (
+        _in_area_query(db, user_lat, user_lng, radius_miles)
+        .options(joinedload(Post.comments), joinedload(Post.user))
+        .all()
+    )
+    posts = _within_radius(candidates, user_lat, user_lng, radius_miles)
+    return jsonable_encoder([_serialize_post(post, False) for post in posts])
+
+
+def _nearest_hits(db: Session, user_lat: float, user_lng: float, n: int) -> List[Tuple[float, int, int]]:
+    """(distance, id, version) of the n closest live posts within MAX_RADIUS_FEET, nearest first.
+
+    Walks outward in rings (doubling the radius) over the (latitude, longitude)
+    index, fetching only coordinates and versions until the circle holds n
+    posts. Anything outside a ring's circle is farther than everything inside
+    it, so the first ring with n hits contains the answer. The hits double as
+    the validator, so a 304 costs no more than this walk.
+    """
+    radius_feet = MIN_RADIUS_FEET
+    while True:
+        radius_miles = radius_feet / FEET_PER_MILE
+        points = (
+            _in_area_query(db, user_lat, user_lng, radius_miles)
+            .with_entities(Post.id, Post.latitude, Post.longitude, Post.version)
+            .all()
         )
+        hits = heapq.nsmallest(n, (
+            (d, pid, version) for pid, lat, lng, version in points
+            if (d := distance_miles(user_lat, user_lng, lat, lng)) <= radius_miles
+        ))
+        if len(hits) >= n or radius_feet >= MAX_RADIUS_FEET:
+            return hits
+        radius_feet = min(radius_feet * 2, MAX_RADIUS_FEET)
+
+
+def _load_nearest_payload(db: Session, hits: List[Tuple[float, int, int]]) -> List[dict]:
+    """Full rows for `_nearest_hits`, in the same order, with their distance."""
+    rows = {
+        p.id: p for p in
+        db.query(Post)
+        .filter(Post.id.in_([pid for _, pid, _ in hits]))
+        .options(joinedload(Post.comments), joinedload(Post.user))
+        .all()
+    }
+    payload = []
+    for d, pid, _ in hits:
+        if pid in rows:  # deleted between the two queries
+            post_dict = _serialize_post(rows[pid], False)
+            post_dict["distance_feet"] = round(d * FEET_PER_MILE)
+            payload.append(post_dict)
+    return jsonable_encoder(payload)
 
-        if distance <= radius_miles:
-            posts.append(post)
-
-    # user_has_upvoted flag
-    post_with_flags = []
-    for post in posts:
-        has_voted = False
-        if user:
-            has_voted = (
-                db.query(Vote)
-                .filter_by(post_id=post.id, user_id=user["id"])
-                .first()
-                is not None
-            )
-        post_dict = post.__dict__.copy()
-        post_dict["user_has_upvoted"] = has_voted
-        post_dict["comment_count"] = len(post.comments)
-        post_dict["username"] = post.user.username if post.user else "Unknown"
 
-        post_with_flags.append(post_dict)
+@router.get("/posts/changes")
+def get_post_changes(
+    db: Session = Depends(get_read_db),
+    user: Optional[dict] = Depends(get_current_user),
+    user_lat: float = Query(..., description="User latitude"),
+    user_lng: float = Query(..., description="User longitude"),
+    radius_feet: float = Query(1500, description="Search radius in feet (min 1500, max 15840)"),
+    since: Optional[str] = Query(None, description="Sync token from the previous response"),
+):
+    """Delta sync: posts created/changed and ids deleted/expired since `since`.
+
+    When `reset` is true the token was missing or too old; the client should
+    drop its local copy and treat `posts` as the full feed. A post (or deleted
+    id) may be repeated in a later response; clients upsert by id.
+    """
+    try:
+        with db_breaker.guard():
+            return _list_changes(db, user, user_lat, user_lng, radius_feet, since)
+    except (CircuitOpen, *TRIP_ERRORS) as e:
+        retry_after = e.retry_after if isinstance(e, CircuitOpen) else db_breaker.reset_seconds
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Changes temporarily unavailable",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
 
-    return post_with_flags
+
+def _list_changes(db: Session, user: Optional[dict], user_lat: float, user_lng: float,
+                  radius_feet: float, since: Optional[str]) -> dict:
+    purge_expired_posts()
+    set_statement_timeout(db, "get_post_changes")
+
+    since_version, since_xmin, reset = parse_sync_token(since)
+    if reset:
+        since_version = since_xmin = 0
+    radius_miles = radius_feet / FEET_PER_MILE
+    # Before the row queries: the next token must cover anything they can't see yet
+    xmin = snapshot_xmin(db)
+
+    changed = (
+        _in_area_query(db, user_lat, user_lng, radius_miles)
+        .filter(or_(Post.version > since_version, Post.version_xid >= since_xmin))
+        .options(joinedload(Post.comments), joinedload(Post.user))
+        .all()
+    )
+    changed = _within_radius(changed, user_lat, user_lng, radius_miles)
+
+    deleted = []
+    high_water = since_version
+    if not reset:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(user_lat, user_lng, radius_miles)
+        tombstones = (
+            db.query(PostTombstone)
+            .filter(or_(PostTombstone.version > since_version, PostTombstone.version_xid >= since_xmin))
+            .filter(PostTombstone.latitude.between(min_lat, max_lat))
+            .filter(PostTombstone.longitude.between(min_lng, max_lng))
+            .all()
+        )
+        deleted = [t.post_id for t in tombstones]
+        high_water = max([high_water] + [t.version for t in tombstones])
+    high_water = max([high_water] + [p.version for p in changed])
+
+    voted = _upvoted_post_ids(db, user, [p.id for p in changed])
+    return {
+        "token": make_sync_token(high_water, xmin),
+        "reset": reset,
+        "posts": [_serialize_post(post, post.id in voted) for post in changed],
+        "deleted": deleted,
+    }
 
 
 @router.post("/posts", response_model=PostRead)
 def create_post(
     post: PostCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
+    return run_idempotent(
+        idempotency_key, "create_post", user, response,
+        lambda: _create_post(post, db, user),
+        fingerprint=post.model_dump_json(),
+    )
+
+
+def _create_post(post: PostCreate, db: Session, user: dict) -> PostRead:
     new_post = Post(
         text=post.text,
         establishment=post.establishment,
@@ -91,18 +337,31 @@ def create_post(
     db.add(new_post)
     db.commit()
     db.refresh(new_post)
+    trending.record("posts", new_post.establishment, new_post.latitude, new_post.longitude)
+    establishment_index.add_post(new_post)
 
-    print("✅ Created post:", new_post.__dict__)  # 👈 debug log
+    logger.info("post_created", extra={"post_id": new_post.id, "establishment": new_post.establishment})
 
-    return new_post
+    return PostRead.model_validate(new_post)
 
 
 @router.post("/posts/{post_id}/upvote", status_code=status.HTTP_200_OK)
 def upvote_post(
     post_id: int,
+    response: Response,
     db: Session = Depends(get_db),
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
+    # upvote is a toggle: a blind retry would undo the first attempt
+    return run_idempotent(
+        idempotency_key, "upvote_post", user, response,
+        lambda: _toggle_upvote(post_id, db, user),
+        fingerprint=str(post_id),
+    )
+
+
+def _toggle_upvote(post_id: int, db: Session, user: dict) -> dict:
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -110,15 +369,22 @@ def upvote_post(
     existing_vote = db.query(Vote).filter_by(user_id=user["id"], post_id=post_id).first()
 
     if existing_vote:
+        # Undo the weight the vote was recorded with, not a fresh one
+        voted_at = epoch_seconds(existing_vote.created_at)
         db.delete(existing_vote)
         post.upvotes = max(0, post.upvotes - 1)
+        touch_post(db, post)
         db.commit()
+        trending.record("upvotes", post.establishment, post.latitude, post.longitude,
+                        delta=-1, at=voted_at)
         return {"message": "Upvote removed", "upvotes": post.upvotes}
 
     vote = Vote(user_id=user["id"], post_id=post_id)
     db.add(vote)
     post.upvotes += 1
+    touch_post(db, post)
     db.commit()
+    trending.record("upvotes", post.establishment, post.latitude, post.longitude)
 
     return {"message": "Upvoted", "upvotes": post.upvotes}
 
@@ -137,7 +403,9 @@ def delete_post(
     if post.user_id != user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
 
+    tombstone_post(db, post)
     db.delete(post)
     db.commit()
+    establishment_index.remove_post(post_id)
     return {"message": "Post deleted"}
 
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(ge=0, le=1)   # 0 turns sampled profiling off
+    path_prefix: Optional[str] = None        # e.g. "/posts"; None = any path
@@ -0,0 +1,74 @@
+# app/threadpool.py
+# Sync routes and dependencies run on AnyIO's default thread limiter. Out of the
+# box it allows 40 threads regardless of how many DB connections exist; we size
+# it to the connection pool so requests queue for a thread (visibly, cheaply)
+# instead of holding a thread while they queue for a connection. Handlers that
+# don't touch the DB are async so they never wait in that queue.
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import anyio.to_thread
+from anyio import CapacityLimiter
+
+# Explicit override; otherwise lifespan passes the DB pool capacity
+THREADPOOL_TOKENS = int(os.getenv("THREADPOOL_TOKENS", "0"))
+
+_limiter: Optional[CapacityLimiter] = None
+
+
+def configure_threadpool(pool_capacity: int) -> int:
+    """Resize the default limiter; must run on the event loop (lifespan startup)."""
+    global _limiter
+    _limiter = anyio.to_thread.current_default_thread_limiter()
+    _limiter.total_tokens = THREADPOOL_TOKENS or pool_capacity
+    return int(_limiter.total_tokens)
+
+
+class _WaitStats:
+    """Time between a request being ready for a worker thread and getting one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds_total += seconds
+            self.seconds_max = max(self.seconds_max, seconds)
+
+
+thread_waits = _WaitStats()
+
+
+async def mark_dispatched() -> float:
+    """Async dependency: stamped on the event loop right before the sync DB
+    dependency is handed to the threadpool, which reads it once it has a thread."""
+    return time.perf_counter()
+
+
+def record_thread_wait(dispatched_at: float) -> None:
+    thread_waits.record(time.perf_counter() - dispatched_at)
+
+
+def threadpool_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    if _limiter is not None:
+        limiter = _limiter.statistics()
+        stats.update(
+            total_tokens=limiter.total_tokens,
+            borrowed_tokens=limiter.borrowed_tokens,
+            tasks_waiting=limiter.tasks_waiting,
+        )
+    count = thread_waits.count
+    stats.update(
+        waits=count,
+        wait_seconds_total=round(thread_waits.seconds_total, 6),
+        wait_seconds_avg=round(thread_waits.seconds_total / count, 6) if count else 0.0,
+        wait_seconds_max=round(thread_waits.seconds_max, 6),
+    )
+    return stats
@@ -0,0 +1,183 @@
+# app/trending.py
+# "What's hot near me": exponentially decayed activity counters per
+# (geo cell, establishment), updated incrementally from the write paths.
+#
+# Forward decay: an event at time t adds weight * e^((t - landmark) / tau).
+# Every entry in a cell decays by the same factor, so the ranking inside a
+# cell only changes on writes. Each cell keeps a sorted list and a top-K read
+# walks the neighbouring cells' lists until the merged top K is settled,
+# not a scan/GROUP BY.
+import bisect
+import heapq
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.changes import epoch_seconds
+from app.establishments import normalize_establishment
+from app.geo import grid_cell, neighbor_cells
+from app.models.post import Post
+from app.models.comment import Comment
+from app.models.vote import Vote
+
+HALF_LIFE_SECONDS = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", "3600"))
+# Workers only see their own writes between resyncs from the tables
+RESYNC_SECONDS = float(os.getenv("TRENDING_RESYNC_SECONDS", "300"))
+WINDOW = timedelta(hours=24)
+WEIGHTS = {"posts": 3.0, "comments": 2.0, "upvotes": 1.0}
+
+_TAU = HALF_LIFE_SECONDS / math.log(2)
+# Re-base before e^x gets anywhere near float overflow
+_MAX_EXPONENT = 200.0
+
+
+class _Entry:
+    __slots__ = ("name", "score", "counts")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.score = 0.0
+        self.counts = {kind: 0.0 for kind in WEIGHTS}
+
+
+class _Cell:
+    def __init__(self):
+        self.entries: Dict[str, _Entry] = {}
+        self.ranked: List[Tuple[float, str]] = []  # (-score, key), ascending = hottest first
+
+    def add(self, key: str, name: str, kind: str, amount: float) -> None:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = _Entry(name)
+        else:
+            self.ranked.pop(bisect.bisect_left(self.ranked, (-entry.score, key)))
+        entry.counts[kind] = max(0.0, entry.counts[kind] + amount)
+        entry.score = max(0.0, entry.score + WEIGHTS[kind] * amount)
+        bisect.insort(self.ranked, (-entry.score, key))
+
+    def scale(self, factor: float) -> None:
+        for entry in self.entries.values():
+            entry.score *= factor
+            for kind in entry.counts:
+                entry.counts[kind] *= factor
+        self.ranked = [(s * factor, k) for s, k in self.ranked]
+
+
+class TrendingCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells: Dict[Tuple[int, int], _Cell] = {}
+        self._landmark = time.time()
+        self.last_rebuild = 0.0
+
+    def _boost(self, at: float) -> float:
+        exponent = (at - self._landmark) / _TAU
+        if exponent > _MAX_EXPONENT:
+            self._rebase(at)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, now: float) -> None:
+        factor = math.exp(-(now - self._landmark) / _TAU)
+        for cell in self._cells.values():
+            cell.scale(factor)
+        self._landmark = now
+
+    def record(self, kind: str, establishment: str, lat: float, lng: float,
+               delta: int = 1, at: Optional[float] = None) -> None:
+        """kind is 'posts', 'comments' or 'upvotes'; delta -1 undoes an upvote."""
+        if not establishment or lat is None or lng is None:
+            return
+        at = time.time() if at is None else at
+        key = normalize_establishment(establishment)
+        with self._lock:
+            cell = self._cells.setdefault(grid_cell(lat, lng), _Cell())
+            cell.add(key, establishment.strip(), kind, delta * self._boost(at))
+
+    def top(self, lat: float, lng: float, limit: int = 10) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            decay = math.exp(-(now - self._landmark) / _TAU)
+            cells = [cell for cell in map(self._cells.get, neighbor_cells(lat, lng)) if cell is not None]
+            totals = self._merged_top(cells, limit)
+            ranked = []
+            for key, score in totals:
+                item = {"establishment": None, "score": score * decay, **{kind: 0.0 for kind in WEIGHTS}}
+                for cell in cells:
+                    entry = cell.entries.get(key)
+                    if entry is None:
+                        continue
+                    item["establishment"] = item["establishment"] or entry.name
+                    for kind, value in entry.counts.items():
+                        item[kind] += value * decay
+                ranked.append(item)
+        return [
+            {"establishment": item["establishment"], **{k: round(item[k], 2) for k in ("score", *WEIGHTS)}}
+            for item in ranked if item["score"] > 0.01
+        ]
+
+    @staticmethod
+    def _merged_top(cells: List[_Cell], limit: int) -> List[Tuple[str, float]]:
+        """Top `limit` keys by score summed across cells.
+
+        A key can be outside every cell's own top `limit` and still win on the
+        sum, so walk the ranked lists in step (threshold algorithm): once the
+        `limit`-th best total seen is at least the sum of the scores at the
+        current depth, no unseen key can beat it.
+        """
+        totals: Dict[str, float] = {}
+        depth = 0
+        while True:
+            threshold, advanced = 0.0, False
+            for cell in cells:
+                if depth >= len(cell.ranked):
+                    continue
+                neg_score, key = cell.ranked[depth]
+                threshold -= neg_score
+                advanced = True
+                if key not in totals:
+                    totals[key] = sum(c.entries[key].score for c in cells if key in c.entries)
+            best = heapq.nlargest(limit, totals.items(), key=lambda kv: kv[1])
+            if not advanced or (len(best) == limit and best[-1][1] >= threshold):
+                return best
+            depth += 1
+
+    def rebuild(self, db: Session) -> None:
+        """Recompute from the tables (startup and periodic resync across workers)."""
+        since = datetime.utcnow() - WINDOW
+        fresh = TrendingCounters()
+        for establishment, lat, lng, ts in (
+            db.query(Post.establishment, Post.latitude, Post.longitude, Post.timestamp)
+            .filter(Post.timestamp >= since)
+        ):
+            fresh.record("posts", establishment, lat, lng, at=epoch_seconds(ts))
+        for establishment, lat, lng, ts in (
+            db.query(Post.establishment, Post.latitude, Post.longitude, Comment.timestamp)
+            .join(Comment, Comment.post_id == Post.id)
+            .filter(Comment.timestamp >= since)
+        ):
+            fresh.record("comments", establishment, lat, lng, at=epoch_seconds(ts))
+        for establishment, lat, lng, ts in (
+            db.query(Post.establishment, Post.latitude, Post.longitude, Vote.created_at)
+            .join(Vote, Vote.post_id == Post.id)
+            .filter(Vote.created_at >= since)
+        ):
+            fresh.record("upvotes", establishment, lat, lng, at=epoch_seconds(ts))
+
+        with self._lock:
+            self._cells, self._landmark = fresh._cells, fresh._landmark
+            self.last_rebuild = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cells": len(self._cells),
+            "entries": sum(len(c.entries) for c in self._cells.values()),
+        }
+
+
+trending = TrendingCounters()
@@ -0,0 +1,91 @@
+# benchmarks/bench_auth.py
+# Event-loop lag and throughput while N access tokens are verified concurrently.
+# Compares the old inline `jwt.decode(token, jwk_dict)` on the loop with the
+# current path (pre-parsed key, verification on the dedicated pool).
+#
+#   python benchmarks/bench_auth.py --tokens 1000
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("COGNITO_USER_POOL_ID", "us-east-1_bench")
+os.environ.setdefault("COGNITO_CLIENT_ID", "bench-client")
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from jose import jwk, jwt  # noqa: E402
+
+from app.auth import auth  # noqa: E402
+
+
+def make_keys():
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_jwk = jwk.construct(pem, algorithm="RS256").public_key().to_dict()
+    public_jwk.update({"kid": "bench", "use": "sig"})
+    return pem, {"keys": [public_jwk]}
+
+
+def make_tokens(pem: bytes, n: int):
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {"sub": f"user-{i}", "iss": auth.ISSUER, "token_use": "access",
+             "client_id": auth.COGNITO_CLIENT_ID, "iat": now, "exp": now + 3600},
+            pem, algorithm="RS256", headers={"kid": "bench"},
+        )
+        for i in range(n)
+    ]
+
+
+async def inline_decode(token: str, jwks: dict):
+    # What _decode_access_token did before: parse the JWK dict and verify on the loop
+    key = auth._find_key_for_kid(auth._get_kid(token), jwks)
+    return jwt.decode(token, key, algorithms=["RS256"], issuer=auth.ISSUER, options={"verify_aud": False})
+
+
+async def measure(label: str, verify, tokens):
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        # Asks to wake every 1 ms; anything beyond that is time the loop was blocked
+        while not stop.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - t - 0.001) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*(verify(t) for t in tokens))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    lags.sort()
+    print(f"{label:<10} {len(tokens) / elapsed:8.0f} tokens/s   "
+          f"loop lag p50 {statistics.median(lags):6.2f} ms  "
+          f"p99 {lags[int(len(lags) * 0.99) - 1]:6.2f} ms  max {lags[-1]:6.2f} ms  "
+          f"({len(lags)} ticks)")
+
+
+async def main(n: int):
+    pem, jwks = make_keys()
+    tokens = make_tokens(pem, n)
+    auth.near_cache.set(auth._JWKS_CACHE_KEY, jwks, ttl=3600)
+
+    await measure("inline", lambda t: inline_decode(t, jwks), tokens)
+    await measure("offloaded", auth._decode_access_token, tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().tokens))
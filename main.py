@@ -9,10 +9,17 @@ from app.db import engine, Base
 from app.models.post import Post
 from app.models.vote import Vote
 from app.models.comment import Comment
-from app.routes import post_routes, comment_routes
+from app.models.post_tombstone import PostTombstone
+from app.routes import post_routes, comment_routes, admin_routes, establishment_routes
 from app.auth import require_user, optional_user, cognito_info
+from app.middleware import AdmissionControlMiddleware, ProfilingMiddleware
+from app.lifecycle import lifespan
+from app.logging_config import setup_logging, get_logger, RequestIdMiddleware
 
-app = FastAPI()
+setup_logging()
+logger = get_logger("main")
+
+app = FastAPI(lifespan=lifespan)
 
 # SwiftUI is a native client -> CORS is not enforced by iOS, allow all for simplicity
 app.add_middleware(
@@ -22,37 +29,44 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+# Added last so it runs first: shed/throttle before any other work
+app.add_middleware(AdmissionControlMiddleware)
 
 # Init DB
 Base.metadata.create_all(bind=engine)
 
 # Health & root
+# Handlers without DB work are async so they never wait for a threadpool
+# slot (sized to the DB pool) behind slow queries
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok", **cognito_info()}
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "wya? backend is running"}
 
 # Public routers
 app.include_router(post_routes.router)
 app.include_router(comment_routes.router)
+app.include_router(establishment_routes.router)
+app.include_router(admin_routes.router)
 
 # Example protected endpoint
 @app.get("/whoami")
-def whoami(user: Dict[str, Any] = Depends(require_user)):
+async def whoami(user: Dict[str, Any] = Depends(require_user)):
     return {"sub": user.get("sub"), "email": user.get("email"), "aud": user.get("aud")}
 
 # Example that allows anonymous but enriches if signed in
 @app.get("/feed")
-def feed(request: Request, user: Optional[Dict[str, Any]] = Depends(optional_user)):
+async def feed(request: Request, user: Optional[Dict[str, Any]] = Depends(optional_user)):
     # you can branch on `user is None`
     return {"items": [], "signed_in": bool(user)}
 
 # Log routes on boot
-for route in app.routes:
-    try:
-        print(f"{route.path} → {getattr(route, 'methods', {'GET'})}")
-    except Exception:
-        pass
+# This is useful for debugging and understanding the API structure
+logger.debug("routes_registered", extra={
+    "routes": [f"{route.path} {sorted(getattr(route, 'methods', None) or {'GET'})}" for route in app.routes]
+})